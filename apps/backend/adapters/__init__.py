@@ -0,0 +1,24 @@
+"""
+Vendor Adapters - Shared infrastructure for vendor API integrations
+"""
+from .cost_ledger import CostLedger, LedgerConfig, RoutingDecision
+from .http_client import ClientConfig, PooledHTTPClient, get_http_client
+from .query_planner import (
+    QueryPlan,
+    VendorLookupCoalescer,
+    plan_queries,
+    search_stack,
+)
+
+__all__ = [
+    'CostLedger',
+    'LedgerConfig',
+    'RoutingDecision',
+    'ClientConfig',
+    'PooledHTTPClient',
+    'get_http_client',
+    'QueryPlan',
+    'VendorLookupCoalescer',
+    'plan_queries',
+    'search_stack',
+]
@@ -0,0 +1,367 @@
+"""
+Cost Ledger - Per-call vendor spend with rolling totals and budget-aware routing
+Every adapter request is appended to a daily log file and folded into hourly
+buckets as it happens, so day/week/month spend, projections and budget checks
+are constant-time reads that never rescan the log
+"""
+from typing import Any, Dict, Iterable, Optional, Set
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+BUCKET_SECONDS = 3600
+# Rolling windows, in hourly buckets
+WINDOWS = {'day': 24, 'week': 24 * 7, 'month': 24 * 30}
+# Spend over this many recent hours sets the projection rate
+RATE_WINDOW_HOURS = 6
+
+# Budget states, least to most constrained
+OK, AT_RISK, EXHAUSTED = 'ok', 'at_risk', 'exhausted'
+
+
+class RollingSpend:
+    """
+    Hourly buckets for one vendor with running window totals
+
+    record() is O(1). Window totals are rebuilt only when the hour rolls
+    over, which touches at most a month of buckets once an hour.
+    """
+
+    def __init__(self):
+        self._buckets: deque = deque()  # [hour, cost, calls], oldest first
+        self._hour: Optional[int] = None
+        self.totals = {name: {'cost': 0.0, 'calls': 0} for name in WINDOWS}
+        self.recent_cost = 0.0
+
+    def record(self, timestamp: float, cost: float, calls: int = 1):
+        hour = int(timestamp // BUCKET_SECONDS)
+        if hour != self._hour:
+            self._roll(hour)
+        if not self._buckets or self._buckets[-1][0] != hour:
+            # Late entry for an older hour (log replay); fold into its bucket
+            self._late(hour, cost, calls)
+            return
+
+        bucket = self._buckets[-1]
+        bucket[1] += cost
+        bucket[2] += calls
+        for totals in self.totals.values():
+            totals['cost'] += cost
+            totals['calls'] += calls
+        self.recent_cost += cost
+
+    def advance(self, timestamp: float):
+        """Age out buckets when no calls have arrived for a while"""
+        hour = int(timestamp // BUCKET_SECONDS)
+        if hour != self._hour:
+            self._roll(hour)
+
+    def _roll(self, hour: int):
+        if self._hour is not None and hour < self._hour:
+            return
+        self._hour = hour
+        while self._buckets and self._buckets[0][0] <= hour - WINDOWS['month']:
+            self._buckets.popleft()
+        self._buckets.append([hour, 0.0, 0])
+        self._rebuild()
+
+    def _late(self, hour: int, cost: float, calls: int):
+        if hour <= self._hour - WINDOWS['month']:
+            return
+        for bucket in self._buckets:
+            if bucket[0] == hour:
+                bucket[1] += cost
+                bucket[2] += calls
+                break
+        else:
+            self._buckets.append([hour, cost, calls])
+            self._buckets = deque(sorted(self._buckets))
+        self._rebuild()
+
+    def _rebuild(self):
+        for name, hours in WINDOWS.items():
+            in_window = [b for b in self._buckets if b[0] > self._hour - hours]
+            self.totals[name] = {
+                'cost': sum(b[1] for b in in_window),
+                'calls': sum(b[2] for b in in_window)
+            }
+        self.recent_cost = sum(
+            b[1] for b in self._buckets if b[0] > self._hour - RATE_WINDOW_HOURS
+        )
+
+    @property
+    def hourly_rate(self) -> float:
+        return self.recent_cost / RATE_WINDOW_HOURS
+
+
+@dataclass
+class RoutingDecision:
+    """Where a lookup should go given current budgets"""
+    vendor: Optional[str]  # None when only cached results should be served
+    requested: str
+    reason: str = 'within_budget'
+    cache_only: bool = False
+
+    @property
+    def rerouted(self) -> bool:
+        return self.vendor != self.requested
+
+
+@dataclass
+class LedgerConfig:
+    """Per-call prices and rolling 30-day budgets, by vendor"""
+    cost_per_call: Dict[str, float] = field(default_factory=dict)
+    monthly_budgets: Dict[str, float] = field(default_factory=dict)
+    # Projected month spend above this share of budget counts as at risk
+    at_risk_ratio: float = 0.9
+    log_dir: Optional[str] = None
+    # Seconds between reads of calls other processes appended to the log
+    sync_interval: float = 5.0
+
+    @classmethod
+    def from_env(cls) -> 'LedgerConfig':
+        """
+        Build config from the environment:
+        VENDOR_COST_PER_CALL='{"amazon": 0.002}', VENDOR_MONTHLY_BUDGETS='{"amazon": 150}',
+        VENDOR_COST_LOG_DIR for the append-only log, VENDOR_COST_SYNC_INTERVAL
+        """
+        return cls(
+            cost_per_call=json.loads(os.environ.get('VENDOR_COST_PER_CALL', '{}')),
+            monthly_budgets=json.loads(os.environ.get('VENDOR_MONTHLY_BUDGETS', '{}')),
+            at_risk_ratio=float(os.environ.get('VENDOR_BUDGET_AT_RISK', 0.9)),
+            log_dir=os.environ.get('VENDOR_COST_LOG_DIR'),
+            sync_interval=float(os.environ.get('VENDOR_COST_SYNC_INTERVAL', 5.0))
+        )
+
+
+class CostLedger:
+    """
+    Append-only record of vendor calls and what they cost
+
+    The log is one JSON line per call in a file per UTC day. It is read
+    once at startup to restore the rolling totals; after that, every read
+    comes from the in-memory counters.
+
+    Web workers each hold their own ledger. With a log_dir they share the
+    log and follow it, folding in other processes' calls every
+    sync_interval seconds, so budgets hold across workers (to within that
+    lag). Without a log_dir, totals are per process and a budget is only a
+    soft cap per worker.
+    """
+
+    def __init__(self, config: Optional[LedgerConfig] = None):
+        self.config = config or LedgerConfig()
+        self._lock = threading.Lock()
+        self._spend: Dict[str, RollingSpend] = {}
+        self._routing = {'rerouted': 0, 'cache_only': 0}
+        self._log_file = None
+        self._log_day: Optional[str] = None
+        self._offsets: Dict[str, int] = {}  # Log bytes already folded in, by path
+        self._synced_at = time.monotonic()
+
+        if self.config.log_dir:
+            os.makedirs(self.config.log_dir, exist_ok=True)
+            self._replay()
+
+    def cost_per_call(self, vendor: str) -> float:
+        return float(self.config.cost_per_call.get(vendor, 0.0))
+
+    def record(
+        self,
+        vendor: str,
+        cost: Optional[float] = None,
+        calls: int = 1,
+        timestamp: Optional[float] = None,
+        **details
+    ) -> float:
+        """Log a vendor call (at list price unless cost is given) and return its cost"""
+        now = timestamp if timestamp is not None else time.time()
+        if cost is None:
+            cost = self.cost_per_call(vendor) * calls
+
+        with self._lock:
+            self._spend_for(vendor).record(now, cost, calls)
+            if self.config.log_dir:
+                self._append({
+                    'ts': now, 'vendor': vendor, 'cost': cost, 'calls': calls,
+                    'writer': self._writer_id(), **details
+                })
+        return cost
+
+    def _spend_for(self, vendor: str) -> RollingSpend:
+        spend = self._spend.get(vendor)
+        if spend is None:
+            spend = self._spend[vendor] = RollingSpend()
+        return spend
+
+    # Append-only log
+
+    def _log_path(self, day: str) -> str:
+        return os.path.join(self.config.log_dir, f"costs-{day}.jsonl")
+
+    def _writer_id(self) -> str:
+        # Includes the pid so a ledger inherited across fork gets a new id
+        return f"{os.getpid()}:{id(self)}"
+
+    def _append(self, entry: Dict[str, Any]):
+        day = datetime.fromtimestamp(entry['ts'], timezone.utc).strftime('%Y%m%d')
+        if day != self._log_day:
+            if self._log_file is not None:
+                self._log_file.close()
+            # Line buffered: each call is on disk before the request finishes
+            self._log_file = open(self._log_path(day), 'a', buffering=1, encoding='utf-8')
+            self._log_day = day
+        self._log_file.write(json.dumps(entry, separators=(',', ':')) + '\n')
+
+    def _replay(self):
+        """Restore rolling totals from the last month of log files"""
+        today = datetime.now(timezone.utc).date()
+        for offset in range(WINDOWS['month'] // 24, -1, -1):
+            path = self._log_path((today - timedelta(days=offset)).strftime('%Y%m%d'))
+            if os.path.exists(path):
+                self._read_new(path)
+
+    def _read_new(self, path: str, skip_writer: Optional[str] = None):
+        """Fold in log lines appended to path since it was last read"""
+        position = self._offsets.get(path, 0)
+        with open(path, 'rb') as f:
+            f.seek(position)
+            data = f.read()
+        # A line another process is still writing is picked up next time
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            try:
+                entry = json.loads(line)
+                if skip_writer is not None and entry.get('writer') == skip_writer:
+                    continue
+                self._spend_for(entry['vendor']).record(
+                    entry['ts'], entry['cost'], entry.get('calls', 1)
+                )
+            except (ValueError, KeyError):
+                logger.warning("Skipping malformed cost log line in %s", path)
+        self._offsets[path] = position + end
+
+    def _sync(self):
+        """Fold in calls other processes logged since the last sync (caller holds the lock)"""
+        if not self.config.log_dir or time.monotonic() - self._synced_at < self.config.sync_interval:
+            return
+        self._synced_at = time.monotonic()
+        today = datetime.now(timezone.utc).date()
+        # Yesterday too, for lines appended just before midnight UTC
+        paths = [self._log_path(day.strftime('%Y%m%d')) for day in (today - timedelta(days=1), today)]
+        for path in paths:
+            if os.path.exists(path):
+                self._read_new(path, skip_writer=self._writer_id())
+        self._offsets = {path: self._offsets[path] for path in paths if path in self._offsets}
+
+    # Budgets
+
+    def budget_status(self, vendor: str, now: Optional[float] = None) -> str:
+        budget = self.config.monthly_budgets.get(vendor)
+        if budget is None:
+            return OK
+        with self._lock:
+            self._sync()
+            spend = self._spend_for(vendor)
+            spend.advance(now if now is not None else time.time())
+            month = spend.totals['month']['cost']
+            projected = spend.hourly_rate * WINDOWS['month']
+        if month >= budget:
+            return EXHAUSTED
+        if projected >= budget * self.config.at_risk_ratio:
+            return AT_RISK
+        return OK
+
+    def route(self, vendor: str, candidates: Iterable[str]) -> RoutingDecision:
+        """
+        Pick the vendor for a lookup, shifting away from one whose budget is at risk
+
+        At risk: move to the cheapest candidate that is cheaper and within
+        budget, otherwise stay. Exhausted: move to any candidate within
+        budget, otherwise serve cached results only.
+        """
+        status = self.budget_status(vendor)
+        if status == OK:
+            return RoutingDecision(vendor=vendor, requested=vendor)
+
+        price = self.cost_per_call(vendor)
+        alternatives = sorted(
+            (self.cost_per_call(other), other) for other in candidates
+            if other != vendor and self.budget_status(other) == OK
+        )
+        if status == AT_RISK:
+            alternatives = [(cost, other) for cost, other in alternatives if cost < price]
+
+        if alternatives:
+            decision = RoutingDecision(
+                vendor=alternatives[0][1], requested=vendor, reason=f"{vendor}_budget_{status}"
+            )
+        elif status == EXHAUSTED:
+            decision = RoutingDecision(
+                vendor=None, requested=vendor, reason=f"{vendor}_budget_exhausted", cache_only=True
+            )
+        else:
+            return RoutingDecision(vendor=vendor, requested=vendor, reason=f"{vendor}_budget_at_risk")
+
+        with self._lock:
+            self._routing['cache_only' if decision.cache_only else 'rerouted'] += 1
+        return decision
+
+    # Reporting
+
+    def vendor_summary(self, vendor: str, now: Optional[float] = None) -> Dict[str, Any]:
+        with self._lock:
+            self._sync()
+            spend = self._spend_for(vendor)
+            spend.advance(now if now is not None else time.time())
+            totals = {name: dict(values) for name, values in spend.totals.items()}
+            hourly_rate = spend.hourly_rate
+
+        month_calls = totals['month']['calls']
+        return {
+            'today': totals['day']['cost'],
+            'week': totals['week']['cost'],
+            'month': totals['month']['cost'],
+            'calls_today': totals['day']['calls'],
+            'per_call': totals['month']['cost'] / month_calls if month_calls else self.cost_per_call(vendor),
+            'hourly_rate': hourly_rate,
+            'projection_month': hourly_rate * WINDOWS['month'],
+            'budget_month': self.config.monthly_budgets.get(vendor),
+            'budget_status': self.budget_status(vendor, now)
+        }
+
+    def vendors(self) -> Set[str]:
+        """Every vendor with recorded spend or a configured budget"""
+        with self._lock:
+            return set(self._spend) | set(self.config.monthly_budgets)
+
+    def summary(self, vendors: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """Rolling spend and projections per vendor (default: every vendor seen or configured)"""
+        if vendors is None:
+            vendors = self.vendors()
+        by_vendor = {vendor: self.vendor_summary(vendor) for vendor in sorted(vendors)}
+
+        with self._lock:
+            routing = dict(self._routing)
+        return {
+            'by_vendor': by_vendor,
+            'total_today': sum(v['today'] for v in by_vendor.values()),
+            'total_week': sum(v['week'] for v in by_vendor.values()),
+            'total_month': sum(v['month'] for v in by_vendor.values()),
+            'projection_month': sum(v['projection_month'] for v in by_vendor.values()),
+            'routing': routing
+        }
+
+    def close(self):
+        with self._lock:
+            if self._log_file is not None:
+                self._log_file.close()
+                self._log_file = None
+                self._log_day = None
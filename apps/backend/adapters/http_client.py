@@ -0,0 +1,492 @@
+"""
+Pooled HTTP Client - Shared keep-alive transport for all vendor adapters
+New connections and TLS handshakes per search dominate vendor latency, so every
+adapter goes through one pooled client instead of opening its own sockets
+"""
+from typing import Dict, Any, List, Optional
+from collections import deque
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from urllib.parse import urlsplit
+import asyncio
+import gzip
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from tenacity import (
+    AsyncRetrying,
+    retry_if_exception,
+    stop_after_attempt,
+    stop_after_delay,
+    wait_exponential,
+)
+from urllib3.exceptions import NewConnectionError
+
+from profiling import span
+
+
+# Statuses worth retrying - everything else is returned to the adapter as-is
+RETRYABLE_STATUSES = {429, 502, 503, 504}
+# Methods safe to send twice; others are only retried when the server
+# provably did not act on the first attempt
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE', 'TRACE'}
+# Statuses meaning the request was refused rather than processed
+REFUSED_STATUSES = {429, 503}
+
+
+@dataclass
+class SentAttempt:
+    """Outcome of one attempt that reached the vendor, for monitoring"""
+    success: bool
+    response_time_ms: float
+    headers: Dict[str, str]
+
+
+class SentRequests:
+    """Requests that reached a vendor inside one count_sent_requests() block"""
+
+    def __init__(self):
+        self.count = 0
+        self.attempts: List[SentAttempt] = []  # Completed attempts, retries included
+
+
+# A ContextVar so each asyncio task (one lookup) counts its own attempts
+_sent_requests: ContextVar[Optional[SentRequests]] = ContextVar('sent_requests', default=None)
+
+
+@contextmanager
+def count_sent_requests():
+    """
+    Count requests the current task sends inside the block, retries included
+
+    Vendors bill each attempt that reaches them, not each logical lookup.
+    Attempts that never connected are not counted.
+    """
+    sent = SentRequests()
+    token = _sent_requests.set(sent)
+    try:
+        yield sent
+    finally:
+        _sent_requests.reset(token)
+
+
+def _note_sent(attempt: Optional[SentAttempt] = None):
+    sent = _sent_requests.get()
+    if sent is not None:
+        sent.count += 1
+        if attempt is not None:
+            sent.attempts.append(attempt)
+
+
+class RetryableStatusError(Exception):
+    """Raised for vendor responses that should be retried"""
+
+    def __init__(self, response: requests.Response):
+        super().__init__(f"HTTP {response.status_code} from {response.url}")
+        self.response = response
+
+
+def _never_sent(error: BaseException) -> bool:
+    """True when the request failed before reaching the server (connect errors)"""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    if isinstance(error, requests.ConnectionError) and error.args:
+        return isinstance(getattr(error.args[0], 'reason', None), NewConnectionError)
+    return False
+
+
+def _should_retry(method: str):
+    """Retry predicate: anything transient for idempotent methods, refusals only otherwise"""
+    idempotent = method.upper() in IDEMPOTENT_METHODS
+
+    def predicate(error: BaseException) -> bool:
+        if isinstance(error, RetryableStatusError):
+            return idempotent or error.response.status_code in REFUSED_STATUSES
+        if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+            # A read timeout on a POST may already have been acted on
+            return idempotent or _never_sent(error)
+        return False
+
+    return predicate
+
+
+def _attempt(success: bool, started: float, outcome) -> SentAttempt:
+    """Attempt record from a response, or an error that may carry one"""
+    response = outcome
+    if not isinstance(outcome, requests.Response):
+        response = getattr(outcome, 'response', None)
+    return SentAttempt(
+        success=success,
+        response_time_ms=(time.perf_counter() - started) * 1000,
+        headers=dict(response.headers) if response is not None else {}
+    )
+
+
+def host_key(scheme: str, host: str, port: Optional[int]) -> str:
+    """Pool/stats key: lowercased host, with the port only when it is not the default"""
+    host = (host or '').lower()
+    default_port = 443 if scheme == 'https' else 80
+    return host if not port or port == default_port else f"{host}:{port}"
+
+
+@dataclass
+class ClientConfig:
+    """Tunables for the shared vendor HTTP client"""
+    max_connections_per_host: int = 10
+    max_hosts: int = 20
+    connect_timeout: float = 3.05
+    read_timeout: float = 10.0
+    max_attempts: int = 3
+    retry_budget_seconds: float = 15.0
+    retry_backoff_max: float = 4.0
+    compress_min_bytes: int = 1024
+
+    @classmethod
+    def from_env(cls) -> 'ClientConfig':
+        """Build config from VENDOR_HTTP_* environment variables"""
+        defaults = cls()
+        return cls(
+            max_connections_per_host=int(os.environ.get(
+                'VENDOR_HTTP_MAX_CONNECTIONS', defaults.max_connections_per_host)),
+            max_hosts=int(os.environ.get('VENDOR_HTTP_MAX_HOSTS', defaults.max_hosts)),
+            connect_timeout=float(os.environ.get(
+                'VENDOR_HTTP_CONNECT_TIMEOUT', defaults.connect_timeout)),
+            read_timeout=float(os.environ.get('VENDOR_HTTP_READ_TIMEOUT', defaults.read_timeout)),
+            max_attempts=int(os.environ.get('VENDOR_HTTP_MAX_ATTEMPTS', defaults.max_attempts)),
+            retry_budget_seconds=float(os.environ.get(
+                'VENDOR_HTTP_RETRY_BUDGET', defaults.retry_budget_seconds)),
+        )
+
+
+class _Waiter:
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.future = loop.create_future()
+        self.granted = False  # Slot handed over; set under the HostSlots lock
+
+
+class HostSlots:
+    """
+    Async counting semaphore for one host, usable from any event loop
+
+    Requests wait for a slot in their coroutine rather than on an executor
+    thread, so a slow host cannot tie up the threads other hosts need.
+    asyncio.Semaphore is bound to one loop, and requests here come from
+    one loop per Flask worker thread.
+    """
+
+    def __init__(self, limit: int):
+        self._lock = threading.Lock()
+        self._available = limit
+        self._waiters: deque = deque()
+
+    async def acquire(self):
+        with self._lock:
+            if self._available > 0 and not self._waiters:
+                self._available -= 1
+                return
+            waiter = _Waiter(asyncio.get_running_loop())
+            self._waiters.append(waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = waiter.granted
+                if not granted:
+                    self._waiters.remove(waiter)
+            if granted:
+                # The slot arrived as we were cancelled; pass it on
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            if not self._waiters:
+                self._available += 1
+                return
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+        waiter.loop.call_soon_threadsafe(_wake, waiter.future)
+
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+@dataclass
+class HostPoolStats:
+    """Per-host counters maintained by the client"""
+    in_use: int = 0
+    peak_in_use: int = 0
+    requests: int = 0
+    retries: int = 0
+    errors: int = 0
+    total_wait_ms: float = 0.0
+    max_wait_ms: float = 0.0
+
+
+class PooledHTTPClient:
+    """
+    Async HTTP client shared by vendor adapters
+    - Keep-alive connection pool capped per host
+    - gzip request bodies and compressed responses
+    - Connect/read timeouts and a bounded retry budget
+    - Pool metrics (in-use, wait time, reuse ratio) for APIMonitor
+    """
+
+    def __init__(self, config: Optional[ClientConfig] = None):
+        self.config = config or ClientConfig()
+
+        self._adapter = HTTPAdapter(
+            pool_connections=self.config.max_hosts,
+            pool_maxsize=self.config.max_connections_per_host,
+            pool_block=True,
+            max_retries=0  # Retries are handled by tenacity below
+        )
+        self.session = requests.Session()
+        self.session.mount('http://', self._adapter)
+        self.session.mount('https://', self._adapter)
+        self.session.headers.update({
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive'
+        })
+
+        # Blocking I/O runs here so the event loop never waits on a socket
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.config.max_connections_per_host * self.config.max_hosts,
+            thread_name_prefix='vendor-http'
+        )
+        self._lock = threading.Lock()
+        self._host_slots: Dict[str, HostSlots] = {}
+        self._stats: Dict[str, HostPoolStats] = {}
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        params: Optional[Dict[str, Any]] = None,
+        json_body: Optional[Any] = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> requests.Response:
+        """
+        Send a request through the shared pool
+
+        Retries connection errors, timeouts and retryable statuses until either
+        max_attempts or the retry budget is exhausted. Non-idempotent methods
+        (POST, PATCH) are only retried on connect failures, 429 and 503.
+        """
+        parts = urlsplit(url)
+        host = host_key(parts.scheme, parts.hostname, parts.port)
+        body, request_headers = self._encode_body(json_body, headers)
+        loop = asyncio.get_running_loop()
+
+        retrying = AsyncRetrying(
+            stop=(stop_after_attempt(self.config.max_attempts)
+                  | stop_after_delay(self.config.retry_budget_seconds)),
+            wait=wait_exponential(multiplier=0.1, max=self.config.retry_backoff_max),
+            retry=retry_if_exception(_should_retry(method)),
+            reraise=True
+        )
+
+        try:
+            with span(f"vendor:{host}"):
+                async for attempt in retrying:
+                    with attempt:
+                        if attempt.retry_state.attempt_number > 1:
+                            with self._lock:
+                                self._host_stats(host).retries += 1
+                        started = time.perf_counter()
+                        try:
+                            response = await self._send_in_slot(
+                                loop, method, url, host, params, body, request_headers
+                            )
+                        except Exception as e:
+                            if not _never_sent(e):
+                                _note_sent(_attempt(False, started, e))
+                            raise
+                        except BaseException:
+                            # Cancelled mid-send: billed, but says nothing about the vendor
+                            _note_sent()
+                            raise
+                        _note_sent(_attempt(response.ok, started, response))
+                        return response
+        except RetryableStatusError as e:
+            # Out of budget - hand the last response back to the adapter
+            return e.response
+        except Exception:
+            with self._lock:
+                self._host_stats(host).errors += 1
+            raise
+
+    async def get_json(self, url: str, **kwargs) -> Dict[str, Any]:
+        """GET a JSON document, returning the body alongside response headers"""
+        response = await self.request('GET', url, **kwargs)
+        response.raise_for_status()
+        return {'data': response.json(), 'headers': dict(response.headers)}
+
+    async def post_json(self, url: str, payload: Any, **kwargs) -> Dict[str, Any]:
+        """POST a JSON payload, returning the body alongside response headers"""
+        response = await self.request('POST', url, json_body=payload, **kwargs)
+        response.raise_for_status()
+        return {'data': response.json(), 'headers': dict(response.headers)}
+
+    def _encode_body(self, json_body: Optional[Any], headers: Optional[Dict[str, str]]):
+        """Serialize a JSON body, gzipping it once it is large enough to matter"""
+        request_headers = dict(headers or {})
+        if json_body is None:
+            return None, request_headers
+
+        body = json.dumps(json_body, separators=(',', ':')).encode('utf-8')
+        request_headers['Content-Type'] = 'application/json'
+        if len(body) >= self.config.compress_min_bytes:
+            body = gzip.compress(body)
+            request_headers['Content-Encoding'] = 'gzip'
+        return body, request_headers
+
+    async def _send_in_slot(self, loop, method, url, host, params, body, headers) -> requests.Response:
+        """Wait for a host slot without holding a thread, then send on the executor"""
+        slot = self._host_slot(host)
+
+        wait_start = time.perf_counter()
+        await slot.acquire()
+        wait_ms = (time.perf_counter() - wait_start) * 1000
+
+        with self._lock:
+            stats = self._host_stats(host)
+            stats.in_use += 1
+            stats.requests += 1
+            stats.peak_in_use = max(stats.peak_in_use, stats.in_use)
+            stats.total_wait_ms += wait_ms
+            stats.max_wait_ms = max(stats.max_wait_ms, wait_ms)
+
+        send = loop.run_in_executor(
+            self._executor, self._send, method, url, params, body, headers
+        )
+        try:
+            # Shielded: if this request is cancelled the send still runs to
+            # completion on its thread, and the slot must stay held until then
+            return await asyncio.shield(send)
+        finally:
+            if send.done():
+                self._release_slot(slot, stats)
+            else:
+                send.add_done_callback(lambda _: self._release_slot(slot, stats))
+
+    def _release_slot(self, slot: HostSlots, stats: HostPoolStats):
+        with self._lock:
+            stats.in_use -= 1
+        slot.release()
+
+    def _send(self, method, url, params, body, headers) -> requests.Response:
+        """Blocking send, run on the executor once a host slot is held"""
+        # urllib3's pool_block=True also caps sockets per host; the slot just
+        # ensures requests queue here instead of on executor threads
+        response = self.session.request(
+            method, url,
+            params=params,
+            data=body,
+            headers=headers,
+            timeout=(self.config.connect_timeout, self.config.read_timeout)
+        )
+        if response.status_code in RETRYABLE_STATUSES:
+            raise RetryableStatusError(response)
+        return response
+
+    def _host_slot(self, host: str) -> HostSlots:
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = HostSlots(self.config.max_connections_per_host)
+                self._host_slots[host] = slot
+            return slot
+
+    def _host_stats(self, host: str) -> HostPoolStats:
+        # Caller must hold self._lock
+        stats = self._stats.get(host)
+        if stats is None:
+            stats = HostPoolStats()
+            self._stats[host] = stats
+        return stats
+
+    def _connection_counts(self) -> Dict[str, Dict[str, int]]:
+        """Pull opened-connection and request counts out of the urllib3 pools"""
+        counts = {}
+        pools = self._adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = host_key(pool.scheme, pool.host, pool.port)
+            entry = counts.setdefault(host, {'connections_opened': 0, 'pool_requests': 0})
+            entry['connections_opened'] += pool.num_connections
+            entry['pool_requests'] += pool.num_requests
+        return counts
+
+    def get_pool_metrics(self) -> Dict[str, Any]:
+        """
+        Snapshot of pool health per host
+
+        reuse_ratio is the share of requests served on an already-open
+        connection; anything well below 1.0 means keep-alive is not working.
+        """
+        counts = self._connection_counts()
+        hosts = {}
+
+        with self._lock:
+            for host, stats in self._stats.items():
+                conn = counts.get(host, {'connections_opened': 0, 'pool_requests': 0})
+                pool_requests = conn['pool_requests']
+                hosts[host] = {
+                    'in_use': stats.in_use,
+                    'peak_in_use': stats.peak_in_use,
+                    'max_connections': self.config.max_connections_per_host,
+                    'requests': stats.requests,
+                    'retries': stats.retries,
+                    'errors': stats.errors,
+                    'avg_wait_ms': stats.total_wait_ms / stats.requests if stats.requests else 0,
+                    'max_wait_ms': stats.max_wait_ms,
+                    'connections_opened': conn['connections_opened'],
+                    'reuse_ratio': (
+                        (pool_requests - conn['connections_opened']) / pool_requests
+                        if pool_requests else 0
+                    )
+                }
+
+        total_requests = sum(h['requests'] for h in hosts.values())
+        total_opened = sum(h['connections_opened'] for h in hosts.values())
+        return {
+            'hosts': hosts,
+            'total_in_use': sum(h['in_use'] for h in hosts.values()),
+            'total_requests': total_requests,
+            'total_connections_opened': total_opened,
+            'reuse_ratio': (
+                max(total_requests - total_opened, 0) / total_requests if total_requests else 0
+            )
+        }
+
+    def close(self):
+        """Close pooled connections and stop the executor"""
+        self.session.close()
+        self._executor.shutdown(wait=False)
+
+
+_shared_client: Optional[PooledHTTPClient] = None
+_shared_lock = threading.Lock()
+
+
+def get_http_client() -> PooledHTTPClient:
+    """Return the process-wide client, creating it from the environment on first use"""
+    global _shared_client
+    if _shared_client is None:
+        with _shared_lock:
+            if _shared_client is None:
+                _shared_client = PooledHTTPClient(ClientConfig.from_env())
+    return _shared_client
@@ -0,0 +1,235 @@
+"""
+Query Planner - Deduplicates vendor lookups across a stack and across requests
+Parsing yields one product per line, but big lists (and many users' lists) repeat
+the same items; vendor calls should scale with unique queries, not lines
+"""
+from typing import Dict, Any, List, Optional
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+import asyncio
+import logging
+import threading
+import time
+
+from profiling import span
+from .http_client import count_sent_requests
+
+logger = logging.getLogger(__name__)
+
+
+def canonical_query_key(product: Dict[str, Any]) -> str:
+    """
+    Key that identifies equivalent searches
+
+    Uses the parser's cache_key (order- and unit-independent) when present,
+    falling back to the lowercased, sorted words of the search query.
+    """
+    key = product.get('cache_key')
+    if key:
+        return key
+    return ' '.join(sorted(product.get('search_query', '').lower().split()))
+
+
+@dataclass
+class QueryPlan:
+    """Unique queries for a set of products and which product uses which"""
+    queries: Dict[str, str] = field(default_factory=dict)  # key -> search_query sent
+    assignments: List[Optional[str]] = field(default_factory=list)  # product index -> key
+
+    @property
+    def duplicates_removed(self) -> int:
+        return sum(1 for key in self.assignments if key is not None) - len(self.queries)
+
+
+def plan_queries(products: List[Dict[str, Any]]) -> QueryPlan:
+    """Collapse products into one lookup per unique canonical query"""
+    plan = QueryPlan()
+    for product in products:
+        if not product.get('search_query'):
+            plan.assignments.append(None)
+            continue
+        key = canonical_query_key(product)
+        # First spelling seen is the one sent to the vendor
+        plan.queries.setdefault(key, product['search_query'])
+        plan.assignments.append(key)
+    return plan
+
+
+class _LeaderGone(Exception):
+    """The request making a shared call was cancelled before it finished"""
+
+
+class VendorLookupCoalescer:
+    """
+    Shares vendor lookups between concurrent and recent requests
+
+    - In flight: a second request for the same (vendor, key) awaits the
+      first request's call instead of making its own
+    - Recent: results are reused for window_seconds
+
+    In-flight calls are tracked with concurrent.futures.Future so requests
+    running on different event loops (one per Flask worker thread) can share.
+    Each real vendor call is charged to the cost ledger, when one is given,
+    once per request that reached the vendor (retries are billed too), and
+    every attempt is reported to the API monitor so alerts see real traffic.
+    """
+
+    def __init__(
+        self,
+        window_seconds: float = 30.0,
+        max_entries: int = 10000,
+        ledger=None,
+        monitor=None
+    ):
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        self.ledger = ledger
+        self.monitor = monitor  # APIMonitor (record_lookup)
+        self._lock = threading.Lock()
+        self._in_flight: Dict[tuple, Future] = {}
+        self._recent: 'OrderedDict[tuple, tuple]' = OrderedDict()  # key -> (stored_at, result)
+        self._counts = {'lookups': 0, 'vendor_calls': 0, 'coalesced': 0, 'recent_hits': 0}
+
+    async def search(self, vendor: str, adapter, key: str, query: str) -> Any:
+        """Return adapter.search(query), sharing the call with equivalent lookups"""
+        lookup_key = (vendor, key)
+
+        with self._lock:
+            self._counts['lookups'] += 1
+
+        while True:
+            with self._lock:
+                recent = self._recent.get(lookup_key)
+                if recent is not None:
+                    stored_at, result = recent
+                    if time.monotonic() - stored_at <= self.window_seconds:
+                        self._counts['recent_hits'] += 1
+                        return result
+                    del self._recent[lookup_key]
+
+                shared = self._in_flight.get(lookup_key)
+                if shared is None:
+                    leader = Future()
+                    self._in_flight[lookup_key] = leader
+                    self._counts['vendor_calls'] += 1
+                else:
+                    self._counts['coalesced'] += 1
+
+            if shared is None:
+                return await self._lead(lookup_key, leader, adapter, query)
+
+            waiter = asyncio.wrap_future(shared)
+            # If this follower is cancelled the outcome is never awaited; mark it seen
+            waiter.add_done_callback(lambda f: f.cancelled() or f.exception())
+            try:
+                # Shielded so a cancelled follower cannot cancel the shared call
+                return await asyncio.shield(waiter)
+            except _LeaderGone:
+                # The leading request was cancelled; retry and take over the call
+                continue
+
+    async def _lead(self, lookup_key: tuple, leader: Future, adapter, query: str) -> Any:
+        vendor = lookup_key[0]
+        started = time.perf_counter()
+        try:
+            with span(f"lookup:{vendor}"), count_sent_requests() as sent:
+                result = await adapter.search(query)
+        except Exception as e:
+            if self.ledger is not None:
+                # Failed calls are still billed by most vendors. Adapters that
+                # bypass the pooled client report no attempts; charge one
+                self.ledger.record(vendor, calls=max(sent.count, 1), failed=True)
+            self._report(vendor, sent, False, started)
+            if not leader.done():
+                leader.set_exception(e)
+            raise
+        except BaseException:
+            # Our own cancellation is not the followers' error
+            if not leader.done():
+                leader.set_exception(_LeaderGone())
+            raise
+        else:
+            if self.ledger is not None:
+                self.ledger.record(vendor, calls=max(sent.count, 1))
+            self._report(vendor, sent, True, started, result)
+            self._remember(lookup_key, result)
+            if not leader.done():
+                leader.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._in_flight.pop(lookup_key, None)
+
+    def _report(self, vendor: str, sent, success: bool, started: float, result: Any = None):
+        if self.monitor is None:
+            return
+        headers = result.get('headers') if isinstance(result, dict) else None
+        try:
+            self.monitor.record_lookup(
+                vendor, sent, success, (time.perf_counter() - started) * 1000, headers
+            )
+        except Exception:
+            # Monitoring must never fail (or fail over) a lookup
+            logger.exception("Failed to report %s lookup to the API monitor", vendor)
+
+    def peek(self, vendor: str, key: str) -> Optional[Any]:
+        """Last result kept for (vendor, key), however old; never calls the vendor"""
+        with self._lock:
+            recent = self._recent.get((vendor, key))
+        return recent[1] if recent is not None else None
+
+    def _remember(self, lookup_key: tuple, result: Any):
+        with self._lock:
+            self._recent[lookup_key] = (time.monotonic(), result)
+            self._recent.move_to_end(lookup_key)
+            while len(self._recent) > self.max_entries:
+                self._recent.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+            counts['in_flight'] = len(self._in_flight)
+            counts['recent_entries'] = len(self._recent)
+        counts['dedup_ratio'] = (
+            1 - counts['vendor_calls'] / counts['lookups'] if counts['lookups'] else 0
+        )
+        return counts
+
+
+async def search_stack(
+    products: List[Dict[str, Any]],
+    vendor: str,
+    adapter,
+    coalescer: VendorLookupCoalescer,
+    ledger=None,
+    alternatives: Optional[Dict[str, Any]] = None
+) -> List[Optional[Any]]:
+    """
+    Search a whole stack with one vendor lookup per unique query
+
+    With a cost ledger, the stack is routed by budget first: to a cheaper
+    vendor from alternatives (name -> adapter), or to cached results only.
+    Returns one result per product, in order (None for products with no
+    query, or with no cached result when the budget is exhausted).
+    """
+    plan = plan_queries(products)
+    keys = list(plan.queries)
+
+    if ledger is not None:
+        decision = ledger.route(vendor, alternatives or {})
+        if decision.cache_only:
+            vendors = [vendor, *(alternatives or {})]
+            by_key = {
+                key: next((r for r in (coalescer.peek(v, key) for v in vendors) if r is not None), None)
+                for key in keys
+            }
+            return [by_key[key] if key is not None else None for key in plan.assignments]
+        if decision.rerouted:
+            vendor, adapter = decision.vendor, alternatives[decision.vendor]
+
+    results = await asyncio.gather(*(
+        coalescer.search(vendor, adapter, key, plan.queries[key]) for key in keys
+    ))
+    by_key = dict(zip(keys, results))
+    return [by_key[key] if key is not None else None for key in plan.assignments]
@@ -9,6 +9,8 @@ admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
 # Import and register sub-blueprints
 from .dashboard import dashboard_bp
 from .parser_studio import parser_studio_bp
+from .profiler import profiler_bp
 
 admin_bp.register_blueprint(dashboard_bp)
-admin_bp.register_blueprint(parser_studio_bp)
\ No newline at end of file
+admin_bp.register_blueprint(parser_studio_bp)
+admin_bp.register_blueprint(profiler_bp)
\ No newline at end of file
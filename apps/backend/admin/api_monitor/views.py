@@ -5,9 +5,13 @@ Critical for maintaining service reliability and managing costs
 from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
 from dataclasses import dataclass
+import math
 import time
 import asyncio
 
+# Alert types that belong on the API monitor (the engine also carries parser alerts)
+API_ALERT_TYPES = ('rate_limit', 'error_rate', 'performance')
+
 
 @dataclass
 class VendorStatus:
@@ -29,11 +33,83 @@ class APIMonitor:
     Tracks health, performance, costs, and rate limits
     """
     
-    def __init__(self, vendor_adapters, db, cache, alert_service):
+    def __init__(
+        self,
+        vendor_adapters,
+        db,
+        cache,
+        alert_service,
+        http_client=None,
+        alert_engine=None,
+        cost_ledger=None
+    ):
         self.adapters = vendor_adapters
         self.db = db
         self.cache = cache
         self.alerts = alert_service
+        self.http_client = http_client  # Shared PooledHTTPClient used by adapters
+        self.alert_engine = alert_engine  # AlertEngine fed by record_call
+        self.cost_ledger = cost_ledger  # CostLedger charged for every vendor call
+        
+        if alert_engine is not None and alert_service is not None:
+            alert_engine.subscribe(self._notify_alert_service)
+    
+    def record_call(
+        self,
+        vendor: str,
+        success: bool,
+        response_time_ms: float,
+        headers: Optional[Dict] = None
+    ):
+        """
+        Feed one vendor call into the alert engine
+        
+        Every attempt is recorded as it completes (see record_lookup), so
+        alerts fire within a call of a breach instead of waiting for someone
+        to open the dashboard.
+        """
+        if self.alert_engine is None:
+            return
+        
+        engine = self.alert_engine
+        engine.observe('vendor_error', 0.0 if success else 1.0, key=vendor)
+        engine.observe('response_time_ms', response_time_ms, key=vendor)
+        
+        rate_limit = self._extract_rate_limit_info(headers or {})
+        if rate_limit['remaining'] is not None:
+            try:
+                remaining = float(rate_limit['remaining'])
+            except ValueError:
+                return
+            engine.observe(
+                'rate_limit_remaining', remaining, key=vendor,
+                limit=rate_limit['limit'], reset_time=rate_limit['reset'] or ''
+            )
+    
+    def record_lookup(
+        self,
+        vendor: str,
+        sent,
+        success: bool,
+        response_time_ms: float,
+        headers: Optional[Dict] = None
+    ):
+        """
+        Record each attempt one lookup sent, retries included
+        
+        sent comes from count_sent_requests(). Adapters that bypass the pooled
+        client report no attempts, so the lookup's own outcome counts as one.
+        """
+        if not sent.attempts:
+            self.record_call(vendor, success, response_time_ms, headers)
+            return
+        for attempt in sent.attempts:
+            self.record_call(vendor, attempt.success, attempt.response_time_ms, attempt.headers)
+    
+    def _notify_alert_service(self, event: str, alert):
+        """Forward newly fired alerts to the external alert service"""
+        if event == 'fired':
+            self.alerts.send(alert.to_dict())
     
     async def get_api_dashboard(self) -> Dict[str, Any]:
         """
@@ -47,7 +123,8 @@ class APIMonitor:
             'alerts': await self._get_active_alerts(),
             'cost_breakdown': await self._get_cost_breakdown(),
             'performance_history': await self._get_performance_history(),
-            'rate_limit_warnings': await self._get_rate_limit_warnings()
+            'rate_limit_warnings': await self._get_rate_limit_warnings(),
+            'connection_pools': self._get_connection_pool_metrics()
         }
     
     async def _get_all_vendor_statuses(self) -> Dict[str, VendorStatus]:
@@ -123,63 +200,32 @@ class APIMonitor:
     
     async def _get_active_alerts(self) -> List[Dict[str, Any]]:
         """Get active API-related alerts"""
-        alerts = []
-        
-        for vendor_name in self.adapters:
-            metrics = await self.cache.get(f"vendor_metrics:{vendor_name}") or {}
-            
-            # Check for rate limit warnings
-            if metrics.get('rate_limit_remaining', 1000) < 100:
-                alerts.append({
-                    'vendor': vendor_name,
-                    'type': 'rate_limit',
-                    'severity': 'warning',
-                    'message': f"{vendor_name} approaching rate limit ({metrics.get('rate_limit_remaining')} remaining)",
-                    'action': 'Consider reducing request frequency'
-                })
-            
-            # Check for high error rates
-            if metrics.get('success_rate', 1.0) < 0.95:
-                alerts.append({
-                    'vendor': vendor_name,
-                    'type': 'error_rate',
-                    'severity': 'error',
-                    'message': f"{vendor_name} high error rate ({(1 - metrics.get('success_rate', 1.0)) * 100:.1f}%)",
-                    'action': 'Check vendor status page'
-                })
-            
-            # Check for slow response times
-            if metrics.get('avg_response_time', 0) > 1500:
-                alerts.append({
-                    'vendor': vendor_name,
-                    'type': 'performance',
-                    'severity': 'warning',
-                    'message': f"{vendor_name} slow response time ({metrics.get('avg_response_time')}ms)",
-                    'action': 'Monitor for degradation'
-                })
+        if self.alert_engine is None:
+            return []
         
-        return alerts
+        return [
+            alert for alert in self.alert_engine.active()
+            if alert['type'] in API_ALERT_TYPES
+        ]
     
     async def _get_cost_breakdown(self) -> Dict[str, Any]:
-        """Get detailed cost breakdown by vendor"""
-        costs = {}
+        """
+        Get detailed cost breakdown by vendor
         
-        for vendor_name in self.adapters:
-            metrics = await self.cache.get(f"vendor_metrics:{vendor_name}") or {}
-            costs[vendor_name] = {
-                'today': metrics.get('cost_today', 0),
-                'week': metrics.get('cost_week', 0),
-                'month': metrics.get('cost_month', 0),
-                'per_call': metrics.get('cost_per_call', 0)
+        Rolling day/week/month spend and a projection from the recent hourly
+        rate, read from the ledger's counters
+        """
+        if self.cost_ledger is None:
+            return {
+                'by_vendor': {},
+                'total_today': 0,
+                'total_week': 0,
+                'total_month': 0,
+                'projection_month': 0
             }
         
-        return {
-            'by_vendor': costs,
-            'total_today': sum(v['today'] for v in costs.values()),
-            'total_week': sum(v['week'] for v in costs.values()),
-            'total_month': sum(v['month'] for v in costs.values()),
-            'projection_month': sum(v['month'] for v in costs.values()) * 1.1  # Simple projection
-        }
+        # Vendors called without a registered adapter still cost money
+        return self.cost_ledger.summary(set(self.adapters) | self.cost_ledger.vendors())
     
     async def _get_performance_history(self, hours: int = 24) -> List[Dict]:
         """Get performance history for charts"""
@@ -202,24 +248,44 @@ class APIMonitor:
     
     async def _get_rate_limit_warnings(self) -> List[Dict]:
         """Get vendors approaching rate limits"""
+        if self.alert_engine is None:
+            return []
+        
         warnings = []
         
-        for vendor_name in self.adapters:
-            metrics = await self.cache.get(f"vendor_metrics:{vendor_name}") or {}
-            remaining = metrics.get('rate_limit_remaining', 1000)
-            reset_time = metrics.get('rate_limit_reset', '')
-            
-            if remaining < 500:  # Warning threshold
-                warnings.append({
-                    'vendor': vendor_name,
-                    'remaining': remaining,
-                    'reset_time': reset_time,
-                    'usage_percentage': (1000 - remaining) / 10,  # Assuming 1000 limit
-                    'severity': 'critical' if remaining < 100 else 'warning'
-                })
+        # One alert per vendor: the engine keeps only the most severe rate limit rule
+        for alert in self.alert_engine.active(type='rate_limit'):
+            remaining = alert['value']
+            limit = self._parse_rate_limit(alert['details'].get('limit'))
+            warnings.append({
+                'vendor': alert['vendor'],
+                'remaining': remaining,
+                'reset_time': alert['details'].get('reset_time', ''),
+                # Unknown when the vendor sent no usable limit header
+                'usage_percentage': (
+                    (limit - remaining) / limit * 100 if limit is not None else None
+                ),
+                'severity': alert['severity']
+            })
         
         return sorted(warnings, key=lambda x: x['remaining'])
     
+    def _parse_rate_limit(self, limit) -> Optional[float]:
+        """X-RateLimit-Limit as a positive number (1000 when absent), None when unusable"""
+        if limit is None or limit == '':
+            return 1000.0
+        try:
+            limit = float(limit)
+        except (TypeError, ValueError):
+            return None
+        return limit if math.isfinite(limit) and limit > 0 else None
+    
+    def _get_connection_pool_metrics(self) -> Dict[str, Any]:
+        """Get in-use, wait time and reuse ratio for the shared vendor HTTP pool"""
+        if self.http_client is None:
+            return {}
+        return self.http_client.get_pool_metrics()
+    
     async def test_vendor_api(
         self, 
         vendor: str, 
@@ -232,13 +298,19 @@ class APIMonitor:
         if vendor not in self.adapters:
             raise ValueError(f"Unknown vendor: {vendor}")
         
+        from adapters.http_client import count_sent_requests
+        
         adapter = self.adapters[vendor]
         
         start_time = time.time()
         try:
             # Perform test search
-            response = await adapter.search(test_query)
+            with count_sent_requests() as sent:
+                response = await adapter.search(test_query)
             response_time = (time.time() - start_time) * 1000
+            self.record_lookup(vendor, sent, True, response_time, response.get('headers', {}))
+            if self.cost_ledger is not None:
+                self.cost_ledger.record(vendor, calls=max(sent.count, 1), source='manual_test')
             
             return {
                 'success': True,
@@ -253,6 +325,11 @@ class APIMonitor:
             
         except Exception as e:
             response_time = (time.time() - start_time) * 1000
+            self.record_lookup(vendor, sent, False, response_time)
+            if self.cost_ledger is not None:
+                self.cost_ledger.record(
+                    vendor, calls=max(sent.count, 1), source='manual_test', failed=True
+                )
             
             return {
                 'success': False,
@@ -284,6 +361,8 @@ class APIMonitor:
     async def reset_vendor_metrics(self, vendor: str) -> Dict:
         """Reset metrics for a vendor (useful after fixing issues)"""
         await self.cache.delete(f"vendor_metrics:{vendor}")
+        if self.alert_engine is not None:
+            self.alert_engine.clear(vendor)
         
         return {
             'vendor': vendor,
@@ -5,6 +5,10 @@ from flask import jsonify
 from datetime import datetime, timedelta
 from . import dashboard_bp
 import random  # For demo data
+import subsystems
+
+# Engine severities mapped onto the levels the dashboard UI shows
+DASHBOARD_SEVERITY = {'info': 'low', 'warning': 'medium', 'error': 'high', 'critical': 'high'}
 
 
 @dashboard_bp.route('/metrics', methods=['GET'])
@@ -29,23 +33,17 @@ def get_dashboard_metrics():
 
 @dashboard_bp.route('/alerts', methods=['GET'])
 def get_alerts():
-    """Get system alerts"""
+    """Get system alerts (kept current by the alert engine as metrics arrive)"""
     
     alerts = [
         {
-            'id': 'alert_001',
-            'type': 'warning',
-            'message': 'Parser accuracy below 95% threshold',
-            'timestamp': datetime.now().isoformat(),
-            'severity': 'medium'
-        },
-        {
-            'id': 'alert_002',
-            'type': 'info',
-            'message': 'New parser patterns added successfully',
-            'timestamp': (datetime.now() - timedelta(hours=1)).isoformat(),
-            'severity': 'low'
+            'id': alert['id'],
+            'type': 'info' if alert['severity'] == 'info' else 'warning',
+            'message': alert['message'],
+            'timestamp': alert['timestamp'],
+            'severity': DASHBOARD_SEVERITY[alert['severity']]
         }
+        for alert in subsystems.get('alerts').active()
     ]
     
     return jsonify(alerts)
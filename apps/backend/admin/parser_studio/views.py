@@ -3,15 +3,11 @@ Parser Studio Views - Interactive parser testing
 """
 from flask import jsonify, request
 from . import parser_studio_bp
-import sys
-import os
+from profiling import span
+import logging
+import subsystems
 
-# Add parser to path
-sys.path.append(os.path.join(os.path.dirname(__file__), '../../../../packages/parser/src'))
-from parser import GenericParser
-
-# Initialize parser
-parser = GenericParser()
+logger = logging.getLogger(__name__)
 
 
 @parser_studio_bp.route('/test', methods=['POST'])
@@ -28,13 +24,13 @@ def test_parser():
         
         text = data['text']
         
-        # Parse the text
-        result = parser.parse(text)
+        # Small inputs parse inline, large lists go to the worker pool
+        with span('parse'):
+            result = subsystems.get('parse_executor').parse(text)
         
         # Convert to dict
-        response = {
-            'success': True,
-            'result': {
+        with span('serialize'):
+            payload = {
                 'products': result.products,
                 'tokens': [
                     {
@@ -50,15 +46,115 @@ def test_parser():
                 'parser_used': result.parser_used,
                 'raw_text': result.raw_text
             }
-        }
-        
-        return jsonify(response)
+            response = jsonify({'success': True, 'result': payload})
         
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
+    
+    # Outside the try: bookkeeping must never turn a good parse into a 500
+    record_parse_history(text, payload)
+    subsystems.get('alerts').observe('parse_confidence', result.confidence)
+    
+    return response
+
+
+def record_parse_history(text: str, payload: dict):
+    """Queue a parse for the background history writer; no database time here"""
+    history = subsystems.get('parse_history')
+    if history is None:
+        return
+    try:
+        history.record(text, payload)
+    except Exception:
+        logger.exception("Failed to queue parse history")
+
+
+@parser_studio_bp.route('/sessions', methods=['POST'])
+def create_parse_session():
+    """
+    Start an incremental parse session for the live editor
+    
+    Request body: {"text": "full document"}
+    Returns the session id, version 0 and a parse result per line
+    """
+    data = request.get_json()
+    
+    if not data or 'text' not in data:
+        return jsonify({
+            'success': False,
+            'error': 'Missing "text" field in request body'
+        }), 400
+    
+    if not isinstance(data['text'], str):
+        return jsonify({
+            'success': False,
+            'error': '"text" must be a string'
+        }), 400
+    
+    with span('parse'):
+        session_id, session = subsystems.get('parse_sessions').create(data['text'])
+    
+    return jsonify({
+        'success': True,
+        'session_id': session_id,
+        **session.snapshot()
+    })
+
+
+@parser_studio_bp.route('/sessions/<session_id>/edits', methods=['POST'])
+def edit_parse_session(session_id):
+    """
+    Apply editor changes and return only the re-parsed lines
+    
+    Request body:
+    {
+        "version": 3,
+        "edits": [{"type": "splice", "offset": 120, "delete": 2, "insert": "oz"}]
+    }
+    """
+    from incremental import StaleSessionError
+    
+    session = subsystems.get('parse_sessions').get(session_id)
+    if session is None:
+        return jsonify({
+            'success': False,
+            'error': 'Unknown or expired session'
+        }), 404
+    
+    data = request.get_json()
+    if not data or 'version' not in data or 'edits' not in data:
+        return jsonify({
+            'success': False,
+            'error': 'Request body needs "version" and "edits"'
+        }), 400
+    
+    try:
+        with span('parse'):
+            result = session.apply(data['edits'], int(data['version']))
+    except StaleSessionError as e:
+        # Client is out of sync; it should resend the full text
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'version': session.version
+        }), 409
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({
+            'success': False,
+            'error': f"Invalid edit: {e}"
+        }), 400
+    
+    return jsonify({'success': True, **result})
+
+
+@parser_studio_bp.route('/sessions/<session_id>', methods=['DELETE'])
+def delete_parse_session(session_id):
+    """Close an editor session"""
+    deleted = subsystems.get('parse_sessions').delete(session_id)
+    return jsonify({'success': deleted}), (200 if deleted else 404)
 
 
 @parser_studio_bp.route('/examples', methods=['GET'])
@@ -97,16 +193,74 @@ def get_examples():
 @parser_studio_bp.route('/stats', methods=['GET'])
 def get_parser_stats():
     """Get parser statistics"""
+    history = subsystems.get('parse_history')
     stats = {
         'total_parses_today': 1234,
         'average_confidence': 0.923,
         'average_parse_time_ms': 15,
         'cache_hit_rate': 0.67,
+        'history': history.stats() if history is not None else None,
         'top_patterns': [
-            {'pattern': 'measurement', 'count': 456},
-            {'pattern': 'brand', 'count': 342},
-            {'pattern': 'model', 'count': 234}
+            {'pattern': pattern['name'], 'count': pattern['hits']}
+            for pattern in sorted(
+                subsystems.get('parser').registry.current().stats(),
+                key=lambda p: p['hits'],
+                reverse=True
+            )[:3]
         ]
     }
     
-    return jsonify(stats)
\ No newline at end of file
+    return jsonify(stats)
+
+
+@parser_studio_bp.route('/patterns', methods=['GET'])
+def get_patterns():
+    """Get the active pattern config with per-pattern hit counts and CPU time (inline and pool parses)"""
+    patterns = subsystems.get('parser').registry.current()
+    
+    return jsonify({
+        'version': patterns.version,
+        'loaded_at': patterns.loaded_at,
+        'config': patterns.config,
+        'stats': patterns.stats()
+    })
+
+
+@parser_studio_bp.route('/patterns', methods=['PUT'])
+def publish_patterns():
+    """
+    Publish a new pattern config
+    
+    Request body: the full config with a version higher than the active one.
+    It is validated and compiled before the swap, so a bad config never
+    replaces a working one.
+    """
+    from pattern_registry import PatternConfigError
+    
+    config = request.get_json()
+    
+    try:
+        patterns = subsystems.get('parser').registry.publish(config)
+    except PatternConfigError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
+    return jsonify({'success': True, 'version': patterns.version})
+
+
+@parser_studio_bp.route('/patterns/reload', methods=['POST'])
+def reload_patterns():
+    """Re-read the pattern config file now instead of waiting for the next check"""
+    from pattern_registry import PatternConfigError
+    
+    try:
+        patterns = subsystems.get('parser').registry.reload()
+    except PatternConfigError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
+    return jsonify({'success': True, 'version': patterns.version})
\ No newline at end of file
@@ -0,0 +1,8 @@
+"""
+Profiler Blueprint - Sampled profiling data for production hot paths
+"""
+from flask import Blueprint
+
+profiler_bp = Blueprint('profiler', __name__, url_prefix='/profiler')
+
+from . import views
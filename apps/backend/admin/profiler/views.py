@@ -0,0 +1,62 @@
+"""
+Profiler Views - Flame graph export, span summaries and slow request traces
+"""
+from flask import Response, jsonify, request
+from . import profiler_bp
+from profiling import profiler
+
+
+@profiler_bp.route('/summary', methods=['GET'])
+def get_profile_summary():
+    """Get sampling config and aggregated span timings"""
+    return jsonify(profiler.summary())
+
+
+@profiler_bp.route('/flamegraph', methods=['GET'])
+def get_flamegraph():
+    """
+    Export aggregated stacks in collapsed format
+    
+    Feed to flamegraph.pl, speedscope or inferno:
+        curl .../api/admin/profiler/flamegraph | flamegraph.pl > hot.svg
+    """
+    return Response(profiler.collapsed_stacks(), mimetype='text/plain')
+
+
+@profiler_bp.route('/slow', methods=['GET'])
+def get_slow_requests():
+    """Get span traces of the slowest sampled requests, newest first"""
+    return jsonify(profiler.slow_traces())
+
+
+@profiler_bp.route('/config', methods=['PUT'])
+def update_profile_config():
+    """
+    Change sampling at runtime (this worker only)
+    
+    Request body: {"sample_rate": 0.01, "slow_ms": 300}
+    """
+    data = request.get_json() or {}
+    
+    try:
+        if 'sample_rate' in data:
+            rate = float(data['sample_rate'])
+            if not 0 <= rate <= 1:
+                raise ValueError('sample_rate must be between 0 and 1')
+            profiler.sample_rate = rate
+        if 'slow_ms' in data:
+            profiler.slow_ms = float(data['slow_ms'])
+    except (TypeError, ValueError) as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
+    return jsonify({'success': True, **profiler.summary()})
+
+
+@profiler_bp.route('/reset', methods=['POST'])
+def reset_profile():
+    """Clear collected stacks, spans and slow traces"""
+    profiler.reset()
+    return jsonify({'success': True})
@@ -0,0 +1,336 @@
+"""
+Alerting - Incremental alert evaluation over streaming metric samples
+Rules are checked as each sample arrives (windowed aggregates, hysteresis, one
+alert per rule and key), so the active set is always current and reads are a copy
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SEVERITIES = ('info', 'warning', 'error', 'critical')
+AGGREGATES = ('last', 'avg', 'min', 'max')
+
+MAX_RESOLVED = 200
+
+
+@dataclass
+class AlertRule:
+    """
+    Threshold on a windowed aggregate of one metric
+
+    Fires when the aggregate crosses threshold ('above' or 'below') and only
+    clears once it is back past clear_threshold, so a value hovering at the
+    threshold does not flap. Every key (usually a vendor) is tracked apart.
+    """
+    name: str
+    metric: str
+    threshold: float
+    comparison: str = 'above'  # 'above' or 'below'
+    clear_threshold: Optional[float] = None  # Defaults to threshold (no hysteresis)
+    aggregate: str = 'last'
+    window_seconds: float = 60.0
+    min_samples: int = 1
+    severity: str = 'warning'
+    type: str = 'threshold'
+    message: str = '{key} {metric} is {value}'
+    action: str = ''
+
+    def __post_init__(self):
+        if self.comparison not in ('above', 'below'):
+            raise ValueError(f"{self.name}: comparison must be 'above' or 'below'")
+        if self.aggregate not in AGGREGATES:
+            raise ValueError(f"{self.name}: aggregate must be one of {', '.join(AGGREGATES)}")
+        if self.severity not in SEVERITIES:
+            raise ValueError(f"{self.name}: severity must be one of {', '.join(SEVERITIES)}")
+        if self.clear_threshold is None:
+            self.clear_threshold = self.threshold
+
+    def breached(self, value: float) -> bool:
+        return value > self.threshold if self.comparison == 'above' else value < self.threshold
+
+    def recovered(self, value: float) -> bool:
+        if self.comparison == 'above':
+            return value <= self.clear_threshold
+        return value >= self.clear_threshold
+
+
+class WindowAggregate:
+    """
+    Sliding-window aggregate updated in O(1) amortized per sample
+
+    Keeps a running sum for avg and monotonic deques for min/max.
+    """
+
+    def __init__(self, window_seconds: float):
+        self.window_seconds = window_seconds
+        self._samples: deque = deque()  # (timestamp, value)
+        self._sum = 0.0
+        self._min: deque = deque()
+        self._max: deque = deque()
+
+    def add(self, timestamp: float, value: float):
+        self._samples.append((timestamp, value))
+        self._sum += value
+        while self._min and self._min[-1][1] >= value:
+            self._min.pop()
+        self._min.append((timestamp, value))
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._max.append((timestamp, value))
+        self.evict(timestamp)
+
+    def evict(self, now: float):
+        """Drop samples that have slid out of the window as of now"""
+        cutoff = now - self.window_seconds
+        while self._samples and self._samples[0][0] < cutoff:
+            _, value = self._samples.popleft()
+            self._sum -= value
+        while self._min and self._min[0][0] < cutoff:
+            self._min.popleft()
+        while self._max and self._max[0][0] < cutoff:
+            self._max.popleft()
+
+    @property
+    def count(self) -> int:
+        return len(self._samples)
+
+    def value(self, aggregate: str) -> float:
+        if aggregate == 'last':
+            return self._samples[-1][1]
+        if aggregate == 'avg':
+            return self._sum / len(self._samples)
+        if aggregate == 'min':
+            return self._min[0][1]
+        return self._max[0][1]
+
+
+class Alert:
+    """One firing (or resolved) alert for a rule and key"""
+
+    def __init__(self, rule: AlertRule, key: str, value: float, details: Dict[str, Any], now: float):
+        self.rule = rule
+        self.key = key
+        self.id = f"{rule.name}:{key}"
+        self.value = value
+        self.details = details
+        self.started_at = now
+        self.last_seen = now
+        self.resolved_at: Optional[float] = None
+        self.breach_count = 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        rule = self.rule
+        return {
+            'id': self.id,
+            'rule': rule.name,
+            'vendor': self.key,
+            'type': rule.type,
+            'severity': rule.severity,
+            'message': rule.message.format(key=self.key, metric=rule.metric, value=self.value),
+            'action': rule.action,
+            'value': self.value,
+            'details': self.details,
+            'timestamp': datetime.fromtimestamp(self.started_at).isoformat(),
+            'last_seen': datetime.fromtimestamp(self.last_seen).isoformat(),
+            'resolved_at': (
+                datetime.fromtimestamp(self.resolved_at).isoformat() if self.resolved_at else None
+            ),
+            'breach_count': self.breach_count
+        }
+
+
+class AlertEngine:
+    """
+    Evaluates rules per sample and keeps the active alert set in memory
+
+    observe() only touches the rules subscribed to that metric; active()
+    is proportional to the number of active alerts. Listeners are called
+    with ('fired' | 'resolved', alert) outside the engine lock.
+    """
+
+    def __init__(self, rules: Optional[List[AlertRule]] = None):
+        self._lock = threading.Lock()
+        self._rules: Dict[str, List[AlertRule]] = {}
+        self._windows: Dict[Tuple[str, str], WindowAggregate] = {}
+        self._active: Dict[str, Alert] = {}
+        self._resolved: deque = deque(maxlen=MAX_RESOLVED)
+        self._listeners: List[Callable[[str, Alert], None]] = []
+        for rule in rules or []:
+            self.add_rule(rule)
+
+    def add_rule(self, rule: AlertRule):
+        with self._lock:
+            self._rules.setdefault(rule.metric, []).append(rule)
+
+    def subscribe(self, listener: Callable[[str, Alert], None]):
+        self._listeners.append(listener)
+
+    def observe(self, metric: str, value: float, key: str = 'system', timestamp: Optional[float] = None, **details):
+        """Record one sample and update any alerts it affects"""
+        rules = self._rules.get(metric)
+        if not rules:
+            return
+        now = timestamp if timestamp is not None else time.time()
+        events = []
+
+        with self._lock:
+            for rule in rules:
+                window = self._windows.get((rule.name, key))
+                if window is None:
+                    window = self._windows[(rule.name, key)] = WindowAggregate(rule.window_seconds)
+                window.add(now, value)
+                current = window.value(rule.aggregate)
+                alert_id = f"{rule.name}:{key}"
+                alert = self._active.get(alert_id)
+
+                if window.count < rule.min_samples:
+                    # Too few samples to fire on, but a firing alert may still clear
+                    if alert is not None and rule.recovered(current):
+                        alert.value = current
+                        self._resolve(alert, now)
+                        events.append(('resolved', alert))
+                    continue
+
+                if alert is None:
+                    if rule.breached(current):
+                        alert = Alert(rule, key, current, details, now)
+                        self._active[alert_id] = alert
+                        events.append(('fired', alert))
+                elif rule.recovered(current):
+                    alert.value = current
+                    self._resolve(alert, now)
+                    events.append(('resolved', alert))
+                else:
+                    # Still firing: update in place rather than raising a duplicate
+                    alert.value = current
+                    alert.last_seen = now
+                    alert.details = details or alert.details
+                    if rule.breached(current):
+                        alert.breach_count += 1
+
+        self._notify(events)
+
+    def _notify(self, events: List[Tuple[str, Alert]]):
+        for event, alert in events:
+            for listener in self._listeners:
+                try:
+                    listener(event, alert)
+                except Exception:
+                    logger.exception("Alert listener failed for %s", alert.id)
+
+    def _resolve(self, alert: Alert, now: float):
+        alert.resolved_at = now
+        del self._active[alert.id]
+        self._resolved.append(alert)
+
+    def _expire_stale(self, now: float) -> List[Tuple[str, Alert]]:
+        """
+        Resolve alerts whose key went quiet
+
+        An empty window resolves outright; one that has drained below
+        min_samples resolves once what is left is past the clear threshold.
+        """
+        events = []
+        for alert in list(self._active.values()):
+            rule = alert.rule
+            window = self._windows.get((rule.name, alert.key))
+            if window is not None:
+                window.evict(now)
+            if window is None or window.count == 0:
+                self._resolve(alert, now)
+                events.append(('resolved', alert))
+            elif window.count < rule.min_samples:
+                current = window.value(rule.aggregate)
+                if rule.recovered(current):
+                    alert.value = current
+                    self._resolve(alert, now)
+                    events.append(('resolved', alert))
+        return events
+
+    def active(self, type: Optional[str] = None, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Active alerts, most severe first
+
+        Rules of one type escalate each other (rate limit warning, then
+        critical), so only the most severe alert per type and key is shown.
+        An alert whose window has emptied (or drained below min_samples and
+        recovered) resolves here, since no further sample may arrive to clear it.
+        """
+        now = now if now is not None else time.time()
+        with self._lock:
+            events = self._expire_stale(now)
+            alerts = [
+                alert for alert in self._active.values()
+                if type is None or alert.rule.type == type
+            ]
+        self._notify(events)
+        alerts.sort(key=lambda a: (-SEVERITIES.index(a.rule.severity), -a.started_at))
+
+        shown = []
+        seen = set()
+        for alert in alerts:
+            if (alert.rule.type, alert.key) not in seen:
+                seen.add((alert.rule.type, alert.key))
+                shown.append(alert.to_dict())
+        return shown
+
+    def resolved(self, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._lock:
+            alerts = list(self._resolved)[-limit:]
+        return [alert.to_dict() for alert in reversed(alerts)]
+
+    def clear(self, key: Optional[str] = None):
+        """Forget windows and alerts (for one key, or everything)"""
+        with self._lock:
+            if key is None:
+                self._windows.clear()
+                self._active.clear()
+                return
+            self._windows = {k: w for k, w in self._windows.items() if k[1] != key}
+            self._active = {i: a for i, a in self._active.items() if a.key != key}
+
+
+def default_rules() -> List[AlertRule]:
+    """Vendor and parser rules, with the thresholds the dashboard has always used"""
+    return [
+        AlertRule(
+            name='rate_limit_warning', metric='rate_limit_remaining', comparison='below',
+            threshold=500, clear_threshold=600, severity='warning', type='rate_limit',
+            message='{key} approaching rate limit ({value:.0f} remaining)',
+            action='Consider reducing request frequency'
+        ),
+        AlertRule(
+            name='rate_limit_critical', metric='rate_limit_remaining', comparison='below',
+            threshold=100, clear_threshold=150, severity='critical', type='rate_limit',
+            message='{key} nearly out of rate limit ({value:.0f} remaining)',
+            action='Shift traffic to a fallback vendor'
+        ),
+        AlertRule(
+            name='error_rate', metric='vendor_error', aggregate='avg', window_seconds=300,
+            min_samples=20, threshold=0.05, clear_threshold=0.03, severity='error',
+            type='error_rate', message='{key} high error rate ({value:.1%})',
+            action='Check vendor status page'
+        ),
+        AlertRule(
+            name='slow_responses', metric='response_time_ms', aggregate='avg',
+            window_seconds=300, min_samples=5, threshold=1500, clear_threshold=1200,
+            severity='warning', type='performance',
+            message='{key} slow response time ({value:.0f}ms)',
+            action='Monitor for degradation'
+        ),
+        AlertRule(
+            name='parse_confidence', metric='parse_confidence', aggregate='avg',
+            window_seconds=900, min_samples=50, comparison='below', threshold=0.5,
+            clear_threshold=0.55, severity='warning', type='parser',
+            # Healthy parses score 0.6 (plain keywords) to 0.93; an average
+            # under 0.5 means many inputs are yielding no tokens at all
+            message='Parser confidence averaging {value:.1%}',
+            action='Review recent inputs in Parser Studio'
+        ),
+    ]
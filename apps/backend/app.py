@@ -2,27 +2,42 @@
 SnapStack Backend API
 Flask application with admin interface
 """
-from flask import Flask
+from flask import Blueprint, Flask, jsonify, request
 from flask_cors import CORS
+from dataclasses import asdict
 import os
 
-app = Flask(__name__)
-CORS(app)  # Enable CORS for React frontend
+import profiling
+import subsystems
 
-# Register admin blueprint
-from admin import admin_bp
-app.register_blueprint(admin_bp)
+# Health check and old endpoints kept for compatibility
+core_bp = Blueprint('core', __name__)
 
 
-@app.route('/api/health', methods=['GET'])
+def create_app() -> Flask:
+    """Build the Flask app; heavy subsystems still load lazily on first use"""
+    app = Flask(__name__)
+    CORS(app)  # Enable CORS for React frontend
+    profiling.init_app(app)  # No-op unless PROFILE_SAMPLE_RATE > 0
+    
+    # Register admin blueprint
+    from admin import admin_bp
+    app.register_blueprint(admin_bp)
+    app.register_blueprint(core_bp)
+    return app
+
+
+@core_bp.route('/api/health', methods=['GET'])
 def health():
     """Health check endpoint"""
-    from flask import jsonify
-    return jsonify({'status': 'healthy', 'service': 'snapstack-backend'})
+    return jsonify({
+        'status': 'healthy',
+        'service': 'snapstack-backend',
+        'subsystems': subsystems.status()
+    })
 
 
-# Old endpoints kept for compatibility
-@app.route('/api/admin/parser/test', methods=['POST'])
+@core_bp.route('/api/admin/parser/test', methods=['POST'])
 def test_parser():
     """
     Test the generic parser with input text
@@ -54,31 +69,34 @@ def test_parser():
         
         text = data['text']
         
-        # Parse the text
-        result = parser.parse(text)
+        # Parse the text (parser is built on first use)
+        with profiling.span('parse'):
+            result = subsystems.get('parser').parse(text)
         
         # Convert dataclass to dict
-        response = {
-            'success': True,
-            'result': {
+        with profiling.span('serialize'):
+            payload = {
                 'products': result.products,
                 'tokens': [asdict(token) for token in result.tokens],
                 'confidence': result.confidence,
                 'parser_used': result.parser_used,
                 'raw_text': result.raw_text
             }
-        }
-        
-        return jsonify(response)
+            response = jsonify({'success': True, 'result': payload})
         
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
+    
+    # Outside the try: a history problem never turns a good parse into a 500
+    from admin.parser_studio.views import record_parse_history
+    record_parse_history(text, payload)
+    return response
 
 
-@app.route('/api/admin/parser/examples', methods=['GET'])
+@core_bp.route('/api/admin/parser/examples', methods=['GET'])
 def get_examples():
     """Get example inputs for testing"""
     examples = [
@@ -159,6 +177,19 @@ def get_examples():
     return jsonify(examples)
 
 
+# Parse pool workers re-import this file as __mp_main__ (forkserver/spawn);
+# they only need the parser, so the app is not built there
+if __name__ != '__mp_main__':
+    app = create_app()
+
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
+    
+    # Opt in to building heavy subsystems off the request path. Only in the
+    # reloader's serving child, never at import: under gunicorn call
+    # subsystems.warm_up() from a post_fork hook instead
+    if os.environ.get('SNAPSTACK_WARM_UP') == '1' and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        subsystems.warm_up()
+    
+    app.run(host='0.0.0.0', port=port, debug=True)
@@ -0,0 +1,3 @@
+"""
+Benchmarks - Performance regression checks for the backend
+"""
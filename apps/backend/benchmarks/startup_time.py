@@ -0,0 +1,92 @@
+"""
+Startup Time Benchmark - Measures import time per module in a fresh interpreter
+Fails when a module exceeds its budget so slow imports get caught before deploy
+
+Usage:
+    python -m benchmarks.startup_time              # check against startup_budget.json
+    python -m benchmarks.startup_time --top 20     # also list the slowest imports
+"""
+from typing import Dict, List, Tuple
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+BUDGET_FILE = os.path.join(os.path.dirname(__file__), 'startup_budget.json')
+
+
+def measure_imports(module: str) -> Dict[str, float]:
+    """
+    Import a module in a clean interpreter with -X importtime
+
+    Returns cumulative import time in ms for every module that got loaded.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        env={**os.environ, 'SNAPSTACK_WARM_UP': '0'}
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        # Format: "import time:   self [us] | cumulative | imported package"
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        timings[name.strip()] = int(cumulative) / 1000
+    return timings
+
+
+def measure_module(module: str, runs: int) -> Tuple[float, Dict[str, float]]:
+    """Median cumulative import time of a module plus its last full breakdown"""
+    totals = []
+    timings = {}
+    for _ in range(runs):
+        timings = measure_imports(module)
+        totals.append(timings.get(module, 0.0))
+    return statistics.median(totals), timings
+
+
+def slowest(timings: Dict[str, float], top: int) -> List[Tuple[str, float]]:
+    return sorted(timings.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def main() -> int:
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('--runs', type=int, default=5, help='Runs per module (median is used)')
+    arg_parser.add_argument('--top', type=int, default=0, help='Show the N slowest imports per module')
+    arg_parser.add_argument('--budget', default=BUDGET_FILE, help='JSON file of {module: max_ms}')
+    args = arg_parser.parse_args()
+
+    with open(args.budget) as f:
+        budgets = json.load(f)
+
+    failures = []
+    print(f"{'module':<20} {'median ms':>10} {'budget ms':>10}")
+    for module, budget_ms in budgets.items():
+        median_ms, timings = measure_module(module, args.runs)
+        flag = '' if median_ms <= budget_ms else '  OVER BUDGET'
+        print(f"{module:<20} {median_ms:>10.1f} {budget_ms:>10}{flag}")
+
+        if args.top:
+            for name, ms in slowest(timings, args.top):
+                print(f"    {ms:>8.1f}ms  {name}")
+
+        if median_ms > budget_ms:
+            failures.append(module)
+
+    if failures:
+        print(f"\nStartup regression in: {', '.join(failures)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,249 @@
+"""
+Profiling - Opt-in, sampled request profiling for production workers
+A fraction of requests get span timings and periodic stack samples; stacks are
+aggregated in collapsed (flame graph) format and slow requests keep a full trace
+
+Enable with PROFILE_SAMPLE_RATE (0.0-1.0). Tune with PROFILE_INTERVAL_MS and
+PROFILE_SLOW_MS. Everything is a no-op for requests that are not sampled.
+"""
+from typing import Any, Dict, List, Optional
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+import os
+import random
+import sys
+import threading
+import time
+
+MAX_STACK_DEPTH = 64
+# Bound memory: distinct stacks kept, slow traces kept
+MAX_STACKS = 20000
+MAX_SLOW_TRACES = 50
+
+_current: ContextVar[Optional['RequestProfile']] = ContextVar('request_profile', default=None)
+# Open span names; a ContextVar so concurrent asyncio tasks nest independently
+_open_spans: ContextVar[tuple] = ContextVar('open_spans', default=())
+
+
+class RequestProfile:
+    """Spans and sample count for one sampled request"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.thread_id = threading.get_ident()
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        self.duration_ms: Optional[float] = None
+        self.spans: List[Dict[str, Any]] = []
+        self.samples = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'request': self.name,
+            'started_at': self.started_at,
+            'duration_ms': self.duration_ms,
+            'samples': self.samples,
+            'spans': self.spans
+        }
+
+
+class Profiler:
+    """
+    Process-wide profiler state
+
+    A single sampler thread wakes every interval and records the stacks of
+    threads that are currently serving a sampled request. It exits once no
+    sampled request is in flight.
+    """
+
+    def __init__(self, sample_rate: float = 0.0, interval_ms: float = 5.0, slow_ms: float = 500.0):
+        self.sample_rate = sample_rate
+        self.interval_ms = interval_ms
+        self.slow_ms = slow_ms
+
+        self._lock = threading.Lock()
+        self._active: Dict[int, RequestProfile] = {}
+        self._stacks: Counter = Counter()
+        self._dropped_stacks = 0
+        self._span_stats: Dict[str, Dict[str, float]] = {}
+        self._slow = deque(maxlen=MAX_SLOW_TRACES)
+        self._requests_profiled = 0
+        self._sampler: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls) -> 'Profiler':
+        return cls(
+            sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', 0.0)),
+            interval_ms=float(os.environ.get('PROFILE_INTERVAL_MS', 5.0)),
+            slow_ms=float(os.environ.get('PROFILE_SLOW_MS', 500.0))
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0
+
+    # Request lifecycle
+
+    def start_request(self, name: str, force: bool = False) -> Optional[RequestProfile]:
+        """Decide whether to sample this request; returns its profile if so"""
+        if not force and (not self.enabled or random.random() >= self.sample_rate):
+            return None
+
+        profile = RequestProfile(name)
+        _current.set(profile)
+        with self._lock:
+            self._active[profile.thread_id] = profile
+            self._ensure_sampler()
+        return profile
+
+    def finish_request(self, profile: RequestProfile):
+        profile.duration_ms = (time.perf_counter() - profile.started) * 1000
+        _current.set(None)
+
+        with self._lock:
+            self._active.pop(profile.thread_id, None)
+            self._requests_profiled += 1
+            for span in profile.spans:
+                stats = self._span_stats.setdefault(
+                    span['name'], {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+                )
+                stats['count'] += 1
+                stats['total_ms'] += span['duration_ms']
+                stats['max_ms'] = max(stats['max_ms'], span['duration_ms'])
+            if profile.duration_ms >= self.slow_ms:
+                self._slow.append(profile.to_dict())
+
+    # Stack sampling
+
+    def _ensure_sampler(self):
+        # Caller must hold self._lock
+        if self._sampler is None:
+            self._sampler = threading.Thread(
+                target=self._sample_loop, name='profiler-sampler', daemon=True
+            )
+            self._sampler.start()
+
+    def _sample_loop(self):
+        while True:
+            time.sleep(self.interval_ms / 1000)
+            with self._lock:
+                if not self._active:
+                    # Idle: stop waking up; the next sampled request starts a new sampler
+                    self._sampler = None
+                    return
+                active = dict(self._active)
+
+            frames = sys._current_frames()
+            folded = []
+            for thread_id, profile in active.items():
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    profile.samples += 1
+                    folded.append(f"{profile.name};{_fold_stack(frame)}")
+            del frames
+
+            with self._lock:
+                for stack in folded:
+                    if stack in self._stacks or len(self._stacks) < MAX_STACKS:
+                        self._stacks[stack] += 1
+                    else:
+                        self._dropped_stacks += 1
+
+    # Export
+
+    def collapsed_stacks(self) -> str:
+        """Aggregated stacks in collapsed format ('a;b;c 42'), for flamegraph.pl/speedscope"""
+        with self._lock:
+            lines = [f"{stack} {count}" for stack, count in self._stacks.most_common()]
+        return '\n'.join(lines) + ('\n' if lines else '')
+
+    def slow_traces(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(reversed(self._slow))
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = {
+                name: {**stats, 'avg_ms': stats['total_ms'] / stats['count']}
+                for name, stats in self._span_stats.items()
+            }
+            return {
+                'enabled': self.enabled,
+                'sample_rate': self.sample_rate,
+                'interval_ms': self.interval_ms,
+                'slow_ms': self.slow_ms,
+                'requests_profiled': self._requests_profiled,
+                'distinct_stacks': len(self._stacks),
+                'dropped_stacks': self._dropped_stacks,
+                'spans': spans
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stacks.clear()
+            self._dropped_stacks = 0
+            self._span_stats.clear()
+            self._slow.clear()
+            self._requests_profiled = 0
+
+
+def _fold_stack(frame) -> str:
+    """Root-first 'module:function' frames joined with ';'"""
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        module = frame.f_globals.get('__name__', '?')
+        names.append(f"{module}:{code.co_name}")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+@contextmanager
+def span(name: str):
+    """
+    Time a block as a named span of the current sampled request
+
+    Costs one ContextVar lookup when the request is not being sampled.
+    """
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+
+    open_spans = _open_spans.get()
+    parent = open_spans[-1] if open_spans else None
+    token = _open_spans.set(open_spans + (name,))
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _open_spans.reset(token)
+        profile.spans.append({
+            'name': name,
+            'parent': parent,
+            'offset_ms': (started - profile.started) * 1000,
+            'duration_ms': (time.perf_counter() - started) * 1000
+        })
+
+
+profiler = Profiler.from_env()
+
+
+def init_app(app):
+    """Hook sampling into a Flask app's request lifecycle"""
+    from flask import g, request
+
+    @app.before_request
+    def _start_profile():
+        # X-Profile: 1 forces sampling, but only where profiling is switched on
+        force = profiler.enabled and request.headers.get('X-Profile') == '1'
+        # Route pattern, not path, so /sessions/<session_id> aggregates as one
+        route = request.url_rule.rule if request.url_rule else request.path
+        g.profile = profiler.start_request(f"{request.method} {route}", force=force)
+
+    @app.teardown_request
+    def _finish_profile(exc):
+        profile = g.pop('profile', None)
+        if profile is not None:
+            profiler.finish_request(profile)
@@ -0,0 +1,22 @@
+"""
+Storage - Persistence for parse results and other durable backend data
+"""
+from .parse_history import (
+    ParseHistoryStore,
+    PostgresHistoryBackend,
+    SQLiteHistoryBackend,
+    backend_from_url,
+    normalize_text,
+    store_from_env,
+    text_hash,
+)
+
+__all__ = [
+    'ParseHistoryStore',
+    'PostgresHistoryBackend',
+    'SQLiteHistoryBackend',
+    'backend_from_url',
+    'normalize_text',
+    'store_from_env',
+    'text_hash',
+]
@@ -0,0 +1,358 @@
+"""
+Parse History - Durable record of parse results, keyed by normalized input text
+Requests hand results to a bounded in-memory queue; a writer thread flushes them
+in multi-row batches (COPY on PostgreSQL), so the database never adds latency to
+the request path. Rows expire by day partition: 30 days for parses, 7 for matches
+"""
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from datetime import date, datetime, timedelta, timezone
+import csv
+import hashlib
+import io
+import json
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Retention per record kind, in days (PROJECT_GUIDE caching strategy)
+TTL_DAYS = {
+    'parse': 30,
+    'product_match': 7,
+}
+
+# (text_hash, kind, normalized_text, result_json, confidence, created_at, expires_on)
+Row = Tuple[str, str, str, str, Optional[float], float, str]
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase and collapse whitespace so trivially different inputs share a hash"""
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+
+def _today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+class SQLiteHistoryBackend:
+    """
+    Local stand-in for the PostgreSQL store
+
+    One table with an expires_on day column plays the role of the day
+    partitions; purging deletes whole expired days through its index.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ':memory:':
+            self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS parse_history (
+                text_hash TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                normalized_text TEXT NOT NULL,
+                result TEXT NOT NULL,
+                confidence REAL,
+                created_at REAL NOT NULL,
+                expires_on TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS parse_history_lookup
+                ON parse_history (text_hash, kind, created_at);
+            CREATE INDEX IF NOT EXISTS parse_history_expiry
+                ON parse_history (expires_on);
+        """)
+
+    def write_batch(self, rows: List[Row]):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT INTO parse_history VALUES (?, ?, ?, ?, ?, ?, ?)', rows
+            )
+
+    def lookup(self, digest: str, kind: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT result, created_at FROM parse_history'
+                ' WHERE text_hash = ? AND kind = ? AND expires_on >= ?'
+                ' ORDER BY created_at DESC LIMIT 1',
+                (digest, kind, _today().isoformat())
+            ).fetchone()
+        if row is None:
+            return None
+        return {'result': json.loads(row[0]), 'created_at': row[1]}
+
+    def purge_expired(self) -> int:
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                'DELETE FROM parse_history WHERE expires_on < ?', (_today().isoformat(),)
+            )
+        return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class PostgresHistoryBackend:
+    """
+    PostgreSQL store, range-partitioned by expiry day
+
+    Batches are streamed in with COPY. Expiry drops whole partitions, which
+    is instant and leaves no dead tuples behind for vacuum.
+    """
+
+    def __init__(self, dsn: str):
+        import psycopg2
+
+        self.dsn = dsn
+        self._lock = threading.Lock()
+        self._conn = psycopg2.connect(dsn)
+        self._conn.autocommit = True
+        self._partitions = set()
+        with self._conn.cursor() as cur:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS parse_history (
+                    text_hash CHAR(64) NOT NULL,
+                    kind TEXT NOT NULL,
+                    normalized_text TEXT NOT NULL,
+                    result JSONB NOT NULL,
+                    confidence REAL,
+                    created_at DOUBLE PRECISION NOT NULL,
+                    expires_on DATE NOT NULL
+                ) PARTITION BY RANGE (expires_on)
+            """)
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS parse_history_lookup
+                    ON parse_history (text_hash, kind, created_at DESC)
+            """)
+
+    def _ensure_partitions(self, cur, days: Iterable[str]):
+        for day in set(days) - self._partitions:
+            start = date.fromisoformat(day)
+            cur.execute(
+                f"CREATE TABLE IF NOT EXISTS parse_history_{start:%Y%m%d}"
+                " PARTITION OF parse_history FOR VALUES FROM (%s) TO (%s)",
+                (start, start + timedelta(days=1))
+            )
+            self._partitions.add(day)
+
+    def write_batch(self, rows: List[Row]):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        with self._lock, self._conn.cursor() as cur:
+            self._ensure_partitions(cur, (row[6] for row in rows))
+            cur.copy_expert(
+                'COPY parse_history (text_hash, kind, normalized_text, result,'
+                ' confidence, created_at, expires_on) FROM STDIN WITH (FORMAT csv)',
+                buffer
+            )
+
+    def lookup(self, digest: str, kind: str) -> Optional[Dict[str, Any]]:
+        with self._lock, self._conn.cursor() as cur:
+            cur.execute(
+                'SELECT result, created_at FROM parse_history'
+                ' WHERE text_hash = %s AND kind = %s AND expires_on >= CURRENT_DATE'
+                ' ORDER BY created_at DESC LIMIT 1',
+                (digest, kind)
+            )
+            row = cur.fetchone()
+        if row is None:
+            return None
+        return {'result': row[0], 'created_at': row[1]}
+
+    def purge_expired(self) -> int:
+        """Drop partitions for days that have fully expired"""
+        cutoff = f"parse_history_{_today():%Y%m%d}"
+        dropped = 0
+        with self._lock, self._conn.cursor() as cur:
+            cur.execute("""
+                SELECT child.relname FROM pg_inherits
+                JOIN pg_class parent ON pg_inherits.inhparent = parent.oid
+                JOIN pg_class child ON pg_inherits.inhrelid = child.oid
+                WHERE parent.relname = 'parse_history'
+            """)
+            for (name,) in cur.fetchall():
+                # Partition names sort by day, so a string compare finds old ones
+                if name < cutoff:
+                    cur.execute(f'DROP TABLE IF EXISTS {name}')
+                    self._partitions.discard(
+                        datetime.strptime(name[-8:], '%Y%m%d').date().isoformat()
+                    )
+                    dropped += 1
+        return dropped
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ParseHistoryStore:
+    """
+    Write-behind front end for a history backend
+
+    record() never blocks: when the queue is full the row is dropped and
+    counted, because history is a cache and a corpus, not a source of truth.
+    """
+
+    def __init__(
+        self,
+        backend,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        max_queue: int = 10000,
+        purge_interval: float = 3600.0
+    ):
+        self.backend = backend
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.purge_interval = purge_interval
+        self._queue: 'queue.Queue[Optional[Row]]' = queue.Queue(maxsize=max_queue)
+        self._counts = {'queued': 0, 'written': 0, 'dropped': 0, 'batches': 0,
+                        'write_errors': 0, 'purged': 0}
+        self._stats_lock = threading.Lock()
+        self._last_purge = 0.0
+        self._closed = False
+        self._writer = threading.Thread(
+            target=self._write_loop, name='parse-history-writer', daemon=True
+        )
+        self._writer.start()
+
+    def record(self, text: str, result: Dict[str, Any], kind: str = 'parse'):
+        """Queue a result for writing; returns immediately"""
+        if self._closed:
+            return
+        normalized = normalize_text(text)
+        now = time.time()
+        expires_on = _today() + timedelta(days=TTL_DAYS[kind])
+        row = (
+            hashlib.sha256(normalized.encode('utf-8')).hexdigest(),
+            kind,
+            normalized,
+            json.dumps(result, separators=(',', ':')),
+            result.get('confidence'),
+            now,
+            expires_on.isoformat()
+        )
+        try:
+            self._queue.put_nowait(row)
+            self._count('queued')
+        except queue.Full:
+            self._count('dropped')
+
+    def lookup(self, text: str, kind: str = 'parse') -> Optional[Dict[str, Any]]:
+        """Most recent unexpired result for text (or an equivalent spelling of it)"""
+        return self.backend.lookup(text_hash(text), kind)
+
+    def _count(self, name: str, amount: int = 1):
+        with self._stats_lock:
+            self._counts[name] += amount
+
+    def _write_loop(self):
+        stopping = False
+        while not stopping:
+            batch: List[Row] = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    row = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if row is None:
+                    stopping = True
+                    break
+                batch.append(row)
+
+            if batch:
+                self._flush(batch)
+            if time.monotonic() - self._last_purge >= self.purge_interval:
+                self._purge()
+
+    def _flush(self, batch: List[Row]):
+        try:
+            self.backend.write_batch(batch)
+        except Exception:
+            logger.exception("Failed to write %d parse history rows", len(batch))
+            self._count('write_errors')
+            self._count('dropped', len(batch))
+        else:
+            self._count('written', len(batch))
+            self._count('batches')
+
+    def _purge(self):
+        self._last_purge = time.monotonic()
+        try:
+            self._count('purged', self.backend.purge_expired())
+        except Exception:
+            logger.exception("Parse history purge failed")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            counts = dict(self._counts)
+        counts['backlog'] = self._queue.qsize()
+        counts['backend'] = type(self.backend).__name__
+        return counts
+
+    def close(self, timeout: float = 5.0):
+        """Flush queued rows and stop the writer"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join(timeout)
+        self.backend.close()
+
+
+SUPPORTED_SCHEMES = ('postgres', 'postgresql', 'sqlite')
+
+
+def _scheme(url: str) -> str:
+    """URL scheme without an SQLAlchemy driver suffix ('postgresql+psycopg2' -> 'postgresql')"""
+    return url.split('://', 1)[0].split('+', 1)[0].lower() if '://' in url else ''
+
+
+def backend_from_url(url: str):
+    """
+    postgresql://... for PostgreSQL (SQLAlchemy driver suffixes are accepted);
+    SQLAlchemy-style sqlite:///relative.db, sqlite:////absolute.db or
+    sqlite:// (in memory) for local use
+    """
+    scheme = _scheme(url)
+    if scheme in ('postgres', 'postgresql'):
+        return PostgresHistoryBackend('postgresql://' + url.split('://', 1)[1])
+    if scheme == 'sqlite':
+        path = url.split('://', 1)[1][1:]
+        return SQLiteHistoryBackend(path or ':memory:')
+    raise ValueError(f"Unsupported parse history URL scheme: {scheme or url!r}")
+
+
+def store_from_env() -> Optional[ParseHistoryStore]:
+    """
+    Store for PARSE_HISTORY_URL, or None when unset
+
+    DATABASE_URL is used as a fallback only when it points at a supported
+    database; it is shared with other code and may name one we cannot use.
+    """
+    url = os.environ.get('PARSE_HISTORY_URL')
+    if not url:
+        url = os.environ.get('DATABASE_URL')
+        if not url or _scheme(url) not in SUPPORTED_SCHEMES:
+            return None
+    batch_size = os.environ.get('PARSE_HISTORY_BATCH')
+    return ParseHistoryStore(
+        backend_from_url(url),
+        batch_size=int(batch_size) if batch_size else 500
+    )
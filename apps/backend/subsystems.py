@@ -0,0 +1,207 @@
+"""
+Subsystems - Lazily initialized heavy components shared across requests
+Parser tiers, vendor adapters, storage and the API monitor are built on first use (or by
+the background warm-up hook) so importing the app stays cheap for worker boot
+"""
+from typing import Any, Callable, Dict, Iterable, Optional
+import atexit
+import logging
+import os
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+PARSER_SRC = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '../../packages/parser/src')
+)
+
+
+class LazySubsystem:
+    """A component that is constructed once, on first access, thread-safely"""
+
+    def __init__(self, name: str, factory: Callable[[], Any]):
+        self.name = name
+        self.factory = factory
+        self.init_time_ms: Optional[float] = None
+        self._instance = None
+        self._ready = False
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def get(self) -> Any:
+        if self._ready:
+            return self._instance
+
+        with self._lock:
+            if not self._ready:
+                start = time.perf_counter()
+                self._instance = self.factory()
+                self.init_time_ms = (time.perf_counter() - start) * 1000
+                self._ready = True
+                logger.info("Initialized %s in %.1fms", self.name, self.init_time_ms)
+        return self._instance
+
+    def reset(self):
+        """Drop the instance so the next access rebuilds it"""
+        with self._lock:
+            self._instance = None
+            self._ready = False
+            self.init_time_ms = None
+
+
+_registry: Dict[str, LazySubsystem] = {}
+
+
+def register(name: str, factory: Callable[[], Any]) -> LazySubsystem:
+    """Register (or replace) a lazily built subsystem"""
+    subsystem = LazySubsystem(name, factory)
+    _registry[name] = subsystem
+    return subsystem
+
+
+def get(name: str) -> Any:
+    """Get a subsystem, building it if this is the first access"""
+    if name not in _registry:
+        raise KeyError(f"Unknown subsystem: {name}")
+    return _registry[name].get()
+
+
+def status() -> Dict[str, Dict[str, Any]]:
+    """Which subsystems are loaded and how long each took to build"""
+    return {
+        name: {'ready': subsystem.ready, 'init_time_ms': subsystem.init_time_ms}
+        for name, subsystem in _registry.items()
+    }
+
+
+def warm_up(names: Optional[Iterable[str]] = None, background: bool = True) -> Optional[threading.Thread]:
+    """
+    Build subsystems ahead of the first request
+
+    Call from a server post-fork hook (or set SNAPSTACK_WARM_UP=1 with the dev
+    server) so workers accept traffic immediately while the heavy imports
+    happen off the request path. Never call it at import time: pool workers
+    re-import the main module.
+    """
+    names = list(names) if names is not None else list(_registry)
+
+    def _warm():
+        for name in names:
+            try:
+                get(name)
+            except Exception:
+                logger.exception("Warm-up failed for %s", name)
+
+    if not background:
+        _warm()
+        return None
+
+    thread = threading.Thread(target=_warm, name='subsystem-warm-up', daemon=True)
+    thread.start()
+    return thread
+
+
+def _ensure_parser_path():
+    if PARSER_SRC not in sys.path:
+        sys.path.append(PARSER_SRC)
+
+
+def _build_parser():
+    _ensure_parser_path()
+    from parser import GenericParser
+    return GenericParser()
+
+
+def _build_parse_executor():
+    _ensure_parser_path()
+    from parse_executor import ParseExecutor
+    workers = os.environ.get('PARSE_WORKERS')
+    executor = ParseExecutor(max_workers=int(workers) if workers else None)
+    # Stop workers and unlink the shared-memory ring when the process exits
+    atexit.register(executor.shutdown)
+    # Requests parse inline until the workers are up; nothing waits on them
+    executor.start_warm_up()
+    return executor
+
+
+def _build_parse_sessions():
+    _ensure_parser_path()
+    from incremental import ParseSessionStore
+    return ParseSessionStore(get('parser'))
+
+
+def _build_http_client():
+    from adapters import get_http_client
+    return get_http_client()
+
+
+def _build_cost_ledger():
+    from adapters import CostLedger, LedgerConfig
+    ledger = CostLedger(LedgerConfig.from_env())
+    atexit.register(ledger.close)
+    return ledger
+
+
+def _build_vendor_lookups():
+    from adapters import VendorLookupCoalescer
+    window = os.environ.get('VENDOR_LOOKUP_WINDOW')
+    return VendorLookupCoalescer(
+        window_seconds=float(window) if window else 30.0,
+        ledger=get('cost_ledger'),
+        monitor=get('api_monitor')
+    )
+
+
+def _build_vendor_adapters() -> Dict[str, Any]:
+    # Concrete vendor adapters (Sovrn, Amazon, eBay) register here once implemented
+    return {}
+
+
+def _build_parse_history():
+    from storage import store_from_env
+    try:
+        store = store_from_env()
+    except Exception:
+        # History is optional: log once and run without it rather than
+        # failing (and retrying a connect on) every parse request
+        logger.exception("Parse history disabled: store could not be initialized")
+        return None
+    if store is not None:
+        # Flush whatever is still queued before the process goes away
+        atexit.register(store.close)
+    return store
+
+
+def _build_alerts():
+    from alerting import AlertEngine, default_rules
+    return AlertEngine(default_rules())
+
+
+def _build_api_monitor():
+    from admin.api_monitor.views import APIMonitor
+    return APIMonitor(
+        vendor_adapters=get('vendor_adapters'),
+        db=None,
+        cache=None,
+        alert_service=None,
+        http_client=get('http_client'),
+        alert_engine=get('alerts'),
+        cost_ledger=get('cost_ledger')
+    )
+
+
+register('parser', _build_parser)
+register('parse_executor', _build_parse_executor)
+register('parse_sessions', _build_parse_sessions)
+register('parse_history', _build_parse_history)
+register('http_client', _build_http_client)
+register('vendor_adapters', _build_vendor_adapters)
+register('cost_ledger', _build_cost_ledger)
+register('vendor_lookups', _build_vendor_lookups)
+register('alerts', _build_alerts)
+register('api_monitor', _build_api_monitor)
@@ -0,0 +1,14 @@
+"""
+Shared test setup - import backend modules the same way the running app does
+"""
+import os
+import sys
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# Parser package modules, as subsystems puts them on the path
+PARSER_SRC = os.path.abspath(os.path.join(BACKEND_DIR, '../../packages/parser/src'))
+if PARSER_SRC not in sys.path:
+    sys.path.append(PARSER_SRC)
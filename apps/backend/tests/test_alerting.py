@@ -0,0 +1,102 @@
+"""
+AlertEngine firing, hysteresis and ageing out of alerts for keys that go quiet
+"""
+from dataclasses import replace
+import asyncio
+
+import pytest
+
+from alerting import AlertEngine, AlertRule, default_rules
+
+
+@pytest.fixture
+def error_rule():
+    return AlertRule(
+        name='error_rate', metric='vendor_error', aggregate='avg', window_seconds=60,
+        threshold=0.5, clear_threshold=0.2, type='error_rate'
+    )
+
+
+def test_fires_once_and_clears_past_clear_threshold(error_rule):
+    engine = AlertEngine([error_rule])
+    events = []
+    engine.subscribe(lambda event, alert: events.append(event))
+
+    engine.observe('vendor_error', 1.0, key='amazon', timestamp=0)
+    engine.observe('vendor_error', 1.0, key='amazon', timestamp=1)
+    assert [a['id'] for a in engine.active(now=1)] == ['error_rate:amazon']
+
+    # avg 0.5 is not past the clear threshold yet
+    engine.observe('vendor_error', 0.0, key='amazon', timestamp=2)
+    engine.observe('vendor_error', 0.0, key='amazon', timestamp=3)
+    assert engine.active(now=3)
+
+    # 2 errors in 11 samples is under 0.2
+    for timestamp in range(4, 11):
+        engine.observe('vendor_error', 0.0, key='amazon', timestamp=timestamp)
+    assert engine.active(now=10) == []
+    assert events == ['fired', 'resolved']
+
+
+def test_alert_for_quiet_key_resolves_once_window_is_empty(error_rule):
+    engine = AlertEngine([error_rule])
+    events = []
+    engine.subscribe(lambda event, alert: events.append((event, alert.key)))
+
+    engine.observe('vendor_error', 1.0, key='amazon', timestamp=0)
+    engine.observe('vendor_error', 1.0, key='walmart', timestamp=50)
+
+    # amazon's last sample is still inside its window
+    assert len(engine.active(now=59)) == 2
+
+    # No more amazon samples: its window empties and the alert resolves
+    active = engine.active(now=70)
+    assert [a['vendor'] for a in active] == ['walmart']
+    assert events[-1] == ('resolved', 'amazon')
+    assert engine.resolved()[0]['id'] == 'error_rate:amazon'
+
+
+def test_typical_parse_confidence_does_not_alert():
+    engine = AlertEngine(default_rules())
+    # Keyword-only parses (0.6) up to measurement-rich ones (0.93)
+    for i in range(100):
+        engine.observe('parse_confidence', (0.6, 0.72, 0.85, 0.93)[i % 4], timestamp=i)
+    assert engine.active(type='parser', now=100) == []
+
+    # Most inputs yielding no tokens at all drags the average under the floor
+    for i in range(100, 300):
+        engine.observe('parse_confidence', 0.0 if i % 3 else 0.6, timestamp=i)
+    assert [a['rule'] for a in engine.active(type='parser', now=300)] == ['parse_confidence']
+
+
+def test_alert_clears_once_its_window_drains_below_min_samples(error_rule):
+    engine = AlertEngine([replace(error_rule, min_samples=3)])
+
+    for timestamp in range(3):
+        engine.observe('vendor_error', 1.0, key='amazon', timestamp=timestamp)
+    assert engine.active(now=2)
+
+    # Only one (healthy) sample is left in the window: too few to fire, enough to clear
+    engine.observe('vendor_error', 0.0, key='amazon', timestamp=62.5)
+    assert engine.active(now=62.5) == []
+
+    for timestamp in range(100, 103):
+        engine.observe('vendor_error', 1.0, key='amazon', timestamp=timestamp)
+    # Failures age out until a single healthy sample remains
+    engine.observe('vendor_error', 0.0, key='amazon', timestamp=150)
+    assert engine.active(now=150)
+    assert engine.active(now=163) == []
+
+
+@pytest.mark.parametrize('limit, usage', [('1000', 95.0), ('', 95.0), ('0', None), ('n/a', None)])
+def test_rate_limit_warnings_survive_bad_limits(limit, usage):
+    from admin.api_monitor.views import APIMonitor
+
+    engine = AlertEngine(default_rules())
+    monitor = APIMonitor({}, None, None, None, alert_engine=engine)
+    monitor.record_call(
+        'amazon', True, 100, {'X-RateLimit-Limit': limit, 'X-RateLimit-Remaining': '50'}
+    )
+
+    [warning] = asyncio.run(monitor._get_rate_limit_warnings())
+    assert warning['usage_percentage'] == usage
@@ -0,0 +1,96 @@
+"""
+CostLedger rolling totals, budgets and sharing spend between processes through the log
+"""
+from dataclasses import replace
+import asyncio
+import time
+
+import pytest
+
+from adapters import CostLedger, LedgerConfig
+from admin.api_monitor.views import APIMonitor
+
+
+@pytest.fixture
+def config(tmp_path):
+    return LedgerConfig(
+        cost_per_call={'amazon': 0.5}, monthly_budgets={'amazon': 10.0},
+        log_dir=str(tmp_path), sync_interval=0
+    )
+
+
+def test_charges_per_call_and_reports_totals(config):
+    ledger = CostLedger(config)
+    ledger.record('amazon')
+    ledger.record('amazon', calls=3)
+
+    summary = ledger.vendor_summary('amazon')
+    assert summary['today'] == 2.0
+    assert summary['calls_today'] == 4
+    assert summary['budget_status'] == 'at_risk'  # 2.0 in the last 6h projects past 10
+
+
+def test_budget_exhausted_routes_to_cache(config):
+    ledger = CostLedger(config)
+    ledger.record('amazon', calls=20)
+    decision = ledger.route('amazon', [])
+    assert decision.cache_only
+    assert decision.reason == 'amazon_budget_exhausted'
+
+
+def test_processes_sharing_a_log_see_each_others_spend(config):
+    first = CostLedger(config)
+    second = CostLedger(config)
+
+    first.record('amazon', calls=12)
+    second.record('amazon', calls=8)
+
+    # Each ledger folds in the other's calls, and counts its own once
+    assert first.vendor_summary('amazon')['calls_today'] == 20
+    assert second.vendor_summary('amazon')['calls_today'] == 20
+    assert first.budget_status('amazon') == 'exhausted'
+
+    # A ledger started later replays everything
+    third = CostLedger(config)
+    assert third.vendor_summary('amazon')['calls_today'] == 20
+    for ledger in (first, second, third):
+        ledger.close()
+
+
+def test_partial_line_is_read_once_complete(config, tmp_path):
+    ledger = CostLedger(config)
+    other = CostLedger(config)
+    other.record('amazon')
+    log_path = next(tmp_path.iterdir())
+
+    # Another process is halfway through writing a line
+    line = f'{{"ts":{time.time()},"vendor":"amazon","cost":0.5,"calls":1,"writer":"x"}}\n'
+    with open(log_path, 'a') as f:
+        f.write(line[:20])
+    assert ledger.vendor_summary('amazon')['calls_today'] == 1
+
+    with open(log_path, 'a') as f:
+        f.write(line[20:])
+    assert ledger.vendor_summary('amazon')['calls_today'] == 2
+    ledger.close()
+    other.close()
+
+
+def test_sync_interval_limits_log_reads(config):
+    ledger = CostLedger(replace(config, sync_interval=60))
+    other = CostLedger(config)
+    other.record('amazon')
+    # Not synced yet: within the interval the ledger serves its own counters
+    assert ledger.vendor_summary('amazon')['calls_today'] == 0
+    ledger.close()
+    other.close()
+
+
+def test_dashboard_breakdown_includes_vendors_without_adapters(config):
+    ledger = CostLedger(config)
+    ledger.record('walmart')
+    monitor = APIMonitor({'ebay': object()}, None, None, None, cost_ledger=ledger)
+
+    breakdown = asyncio.run(monitor._get_cost_breakdown())
+    assert sorted(breakdown['by_vendor']) == ['amazon', 'ebay', 'walmart']
+    ledger.close()
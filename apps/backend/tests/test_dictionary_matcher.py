@@ -0,0 +1,92 @@
+"""
+DictionaryMatcher results against a naive scan, file round trip and the build-time fallback
+"""
+import random
+
+import pytest
+
+import dictionary_matcher
+from dictionary_matcher import (
+    DEFAULT_VOCABULARY, DictionaryMatch, DictionaryMatcher, read_vocabulary, write_automaton
+)
+
+# Overlapping prefixes, suffixes and entries nested inside each other
+OVERLAPPING = ['he', 'she', 'his', 'hers', 'apple', 'apple watch', 'pineapple', 'a', 'aa', 'aaa']
+
+
+def naive_find_all(entries, text):
+    lowered = text.lower()
+    matches = []
+    for entry in set(entry.lower() for entry in entries):
+        start = lowered.find(entry)
+        while start >= 0:
+            end = start + len(entry)
+            before = start == 0 or not lowered[start - 1].isalnum()
+            after = end == len(lowered) or not lowered[end].isalnum()
+            if before and after:
+                matches.append(DictionaryMatch(start, end, entry))
+            start = lowered.find(entry, start + 1)
+    return sorted(matches)
+
+
+def random_text(entries, rng, words=40):
+    fillers = ['x', 'the', 'and', '2', 'é', '-', '', 'AA', 'wAtch']
+    pieces = []
+    for _ in range(words):
+        piece = rng.choice(entries) if rng.random() < 0.5 else rng.choice(fillers)
+        if rng.random() < 0.3:
+            piece = piece.upper()
+        pieces.append(piece)
+        pieces.append(rng.choice([' ', ' ', '', ',', '/', '\n']))
+    return ''.join(pieces)
+
+
+@pytest.mark.parametrize('entries', [OVERLAPPING, read_vocabulary(DEFAULT_VOCABULARY)])
+def test_matches_equal_naive_scan(entries):
+    matcher = DictionaryMatcher.from_entries(entries)
+    rng = random.Random(30)
+
+    for _ in range(200):
+        text = random_text(entries, rng)
+        assert sorted(matcher.find_all(text)) == naive_find_all(entries, text), text
+
+
+def test_find_longest_prefers_the_longer_entry():
+    matcher = DictionaryMatcher.from_entries(OVERLAPPING)
+
+    assert [m.entry for m in matcher.find_longest('an Apple Watch, a pineapple')] == [
+        'apple watch', 'a', 'pineapple'
+    ]
+
+
+def test_compiled_file_round_trip_stays_small(tmp_path):
+    vocabulary = read_vocabulary(DEFAULT_VOCABULARY)
+    path = tmp_path / 'brands.acd'
+    write_automaton(vocabulary, str(path))
+
+    loaded = DictionaryMatcher.load(str(path))
+    text = ' '.join(vocabulary)
+
+    assert loaded.find_all(text) == DictionaryMatcher.from_entries(vocabulary).find_all(text)
+    # Edge lists, not a states x alphabet table
+    assert path.stat().st_size < 200 * len(vocabulary)
+
+
+def test_missing_default_file_is_compiled_in_memory_not_written(tmp_path, monkeypatch):
+    path = tmp_path / 'brands.acd'
+    monkeypatch.setattr(dictionary_matcher, 'DEFAULT_AUTOMATON', str(path))
+    monkeypatch.setattr(dictionary_matcher, '_default_matcher', None)
+    monkeypatch.delenv('PARSER_DICTIONARY', raising=False)
+
+    matcher = dictionary_matcher.load_default_matcher()
+
+    assert not path.exists()
+    assert [m.entry for m in matcher.find_all('sony tv')] == ['sony']
+
+
+def test_old_format_is_rejected():
+    data = bytearray(DictionaryMatcher.from_entries(OVERLAPPING)._buffer)
+    data[4] = 1
+
+    with pytest.raises(ValueError):
+        DictionaryMatcher(bytes(data))
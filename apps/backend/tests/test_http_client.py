@@ -0,0 +1,311 @@
+"""
+PooledHTTPClient against a local stub vendor server
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import asyncio
+import gzip
+import json
+import threading
+import time
+
+import pytest
+import requests
+
+from adapters import CostLedger, LedgerConfig, VendorLookupCoalescer
+from adapters.http_client import ClientConfig, PooledHTTPClient, count_sent_requests, host_key
+
+
+class StubVendorHandler(BaseHTTPRequestHandler):
+    """
+    Stub vendor API
+    - GET /ok              200 JSON
+    - GET|POST /slow?ms=N  200 after N ms
+    - GET|POST /flaky?fail=N&status=S  status S for the first N hits, then 200
+    - POST /echo           reports Content-Encoding and the decoded body
+    """
+    protocol_version = 'HTTP/1.1'  # Keep-alive
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self):
+        url = urlsplit(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+        server = self.server
+        with server.lock:
+            server.hits[url.path] = server.hits.get(url.path, 0) + 1
+            hits = server.hits[url.path]
+
+        if url.path == '/slow':
+            time.sleep(int(query.get('ms', 100)) / 1000)
+            self._reply(200, {'ok': True})
+        elif url.path == '/flaky':
+            if hits <= int(query.get('fail', 1)):
+                self._reply(int(query.get('status', 503)), {'error': 'unavailable'})
+            else:
+                self._reply(200, {'ok': True, 'hits': hits})
+        elif url.path == '/echo':
+            encoding = self.headers.get('Content-Encoding')
+            decoded = gzip.decompress(body) if encoding == 'gzip' else body
+            self._reply(200, {
+                'encoding': encoding,
+                'wire_bytes': len(body),
+                'payload': json.loads(decoded)
+            })
+        else:
+            self._reply(200, {'ok': True})
+
+    do_GET = _handle
+    do_POST = _handle
+
+
+@pytest.fixture
+def vendor_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubVendorHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.hits = {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    server.host = f"127.0.0.1:{server.server_address[1]}"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def make_client():
+    clients = []
+
+    def factory(**config):
+        client = PooledHTTPClient(ClientConfig(**config))
+        clients.append(client)
+        return client
+
+    yield factory
+    for client in clients:
+        client.close()
+
+
+def test_keep_alive_reuses_one_connection(vendor_server, make_client):
+    client = make_client()
+
+    async def run():
+        for _ in range(10):
+            result = await client.get_json(f"{vendor_server.base_url}/ok")
+            assert result['data'] == {'ok': True}
+
+    asyncio.run(run())
+    host = client.get_pool_metrics()['hosts'][vendor_server.host]
+    assert host['requests'] == 10
+    assert host['connections_opened'] == 1
+    assert host['reuse_ratio'] == pytest.approx(0.9)
+
+
+def test_per_host_cap_queues_excess_requests(vendor_server, make_client):
+    client = make_client(max_connections_per_host=2)
+
+    async def run():
+        await asyncio.gather(*(
+            client.request('GET', f"{vendor_server.base_url}/slow?ms=200") for _ in range(6)
+        ))
+
+    started = time.perf_counter()
+    asyncio.run(run())
+    elapsed = time.perf_counter() - started
+
+    host = client.get_pool_metrics()['hosts'][vendor_server.host]
+    assert host['peak_in_use'] == 2
+    assert host['connections_opened'] <= 2
+    # Six 200ms calls two at a time take three rounds; the queued ones waited
+    assert elapsed >= 0.55
+    assert host['max_wait_ms'] >= 150
+
+
+def test_slow_host_does_not_starve_other_hosts(vendor_server, make_client):
+    client = make_client(max_connections_per_host=2, max_hosts=2)
+    port = vendor_server.server_address[1]
+    slow_url = f"http://127.0.0.1:{port}/slow?ms=400"
+    # Same server under another name: a separate host to the client
+    other_url = f"http://localhost:{port}/ok"
+
+    async def run():
+        slow = [asyncio.ensure_future(client.request('GET', slow_url)) for _ in range(8)]
+        await asyncio.sleep(0.05)
+        started = time.perf_counter()
+        await client.request('GET', other_url)
+        other_elapsed = time.perf_counter() - started
+        await asyncio.gather(*slow)
+        return other_elapsed
+
+    # Queued slow requests wait in their coroutines, leaving executor threads free
+    assert asyncio.run(run()) < 0.3
+
+
+def test_cancelled_waiter_does_not_leak_a_slot(vendor_server, make_client):
+    client = make_client(max_connections_per_host=1)
+    url = f"{vendor_server.base_url}/slow?ms=100"
+
+    async def run():
+        first = asyncio.ensure_future(client.request('GET', url))
+        queued = asyncio.ensure_future(client.request('GET', url))
+        await asyncio.sleep(0.02)
+        queued.cancel()
+        await first
+        # The slot came back: this would hang if the cancelled waiter kept it
+        await asyncio.wait_for(client.request('GET', url), timeout=2)
+
+    asyncio.run(run())
+    assert client.get_pool_metrics()['hosts'][vendor_server.host]['in_use'] == 0
+
+
+def test_large_json_bodies_are_gzipped(vendor_server, make_client):
+    client = make_client(compress_min_bytes=1024)
+    large = {'items': ['x' * 50] * 100}
+    small = {'q': 'iphone'}
+
+    async def run():
+        return (
+            await client.post_json(f"{vendor_server.base_url}/echo", large),
+            await client.post_json(f"{vendor_server.base_url}/echo", small)
+        )
+
+    large_reply, small_reply = asyncio.run(run())
+    assert large_reply['data']['encoding'] == 'gzip'
+    assert large_reply['data']['payload'] == large
+    assert large_reply['data']['wire_bytes'] < len(json.dumps(large))
+    assert small_reply['data']['encoding'] is None
+    assert small_reply['data']['payload'] == small
+
+
+def test_retries_503_until_success(vendor_server, make_client):
+    client = make_client(max_attempts=3)
+
+    response = asyncio.run(
+        client.request('GET', f"{vendor_server.base_url}/flaky?fail=2&status=503")
+    )
+    assert response.status_code == 200
+    assert vendor_server.hits['/flaky'] == 3
+    assert client.get_pool_metrics()['hosts'][vendor_server.host]['retries'] == 2
+
+
+def test_retry_budget_stops_retrying(vendor_server, make_client):
+    client = make_client(max_attempts=50, retry_budget_seconds=0.5)
+
+    started = time.perf_counter()
+    response = asyncio.run(
+        client.request('GET', f"{vendor_server.base_url}/flaky?fail=1000&status=503")
+    )
+    elapsed = time.perf_counter() - started
+
+    # Out of budget: the last retryable response goes back to the adapter
+    assert response.status_code == 503
+    assert vendor_server.hits['/flaky'] < 50
+    assert elapsed < 2.0
+
+
+def test_post_is_not_resent_after_read_timeout(vendor_server, make_client):
+    client = make_client(max_attempts=3, read_timeout=0.1)
+
+    with pytest.raises(requests.Timeout):
+        asyncio.run(client.request('POST', f"{vendor_server.base_url}/slow?ms=300", json_body={}))
+    assert vendor_server.hits['/slow'] == 1
+
+    vendor_server.hits.clear()
+    with pytest.raises(requests.Timeout):
+        asyncio.run(client.request('GET', f"{vendor_server.base_url}/slow?ms=300"))
+    assert vendor_server.hits['/slow'] == 3
+
+
+def test_post_retries_refusals_but_not_gateway_errors(vendor_server, make_client):
+    client = make_client(max_attempts=3)
+
+    response = asyncio.run(
+        client.request('POST', f"{vendor_server.base_url}/flaky?fail=1&status=503", json_body={})
+    )
+    assert response.status_code == 200
+
+    vendor_server.hits.clear()
+    response = asyncio.run(
+        client.request('POST', f"{vendor_server.base_url}/flaky?fail=1&status=502", json_body={})
+    )
+    assert response.status_code == 502
+    assert vendor_server.hits['/flaky'] == 1
+
+
+def test_stats_and_pool_counts_share_a_host_key(vendor_server, make_client):
+    client = make_client()
+    port = vendor_server.server_address[1]
+
+    asyncio.run(client.request('GET', f"http://LOCALHOST:{port}/ok"))
+    hosts = client.get_pool_metrics()['hosts']
+    assert list(hosts) == [f"localhost:{port}"]
+    assert hosts[f"localhost:{port}"]['connections_opened'] == 1
+
+
+def test_host_key_drops_default_ports():
+    assert host_key('https', 'API.Vendor.com', 443) == 'api.vendor.com'
+    assert host_key('http', 'api.vendor.com', 80) == 'api.vendor.com'
+    assert host_key('https', 'api.vendor.com', 8443) == 'api.vendor.com:8443'
+    assert host_key('https', 'api.vendor.com', None) == 'api.vendor.com'
+
+
+def test_counts_every_attempt_that_reached_the_vendor(vendor_server, make_client):
+    client = make_client(max_attempts=3)
+
+    async def lookup():
+        with count_sent_requests() as sent:
+            await client.request('GET', f"{vendor_server.base_url}/flaky?fail=2&status=503")
+        return sent.count
+
+    assert asyncio.run(lookup()) == 3
+
+
+def test_ledger_is_charged_for_retries(vendor_server, make_client):
+    client = make_client(max_attempts=3)
+    ledger = CostLedger(LedgerConfig(cost_per_call={'stub': 0.01}))
+    coalescer = VendorLookupCoalescer(ledger=ledger)
+
+    class StubAdapter:
+        async def search(self, query):
+            return await client.get_json(f"{vendor_server.base_url}/flaky?fail=1&status=429")
+
+    asyncio.run(coalescer.search('stub', StubAdapter(), 'drill', 'drill'))
+    # One logical lookup, two billable requests
+    assert coalescer.stats()['vendor_calls'] == 1
+    assert ledger.vendor_summary('stub')['calls_today'] == 2
+
+
+def test_every_lookup_attempt_reaches_the_alert_engine(vendor_server, make_client):
+    from admin.api_monitor.views import APIMonitor
+    from alerting import AlertEngine, AlertRule
+
+    client = make_client(max_attempts=3)
+    engine = AlertEngine([AlertRule(
+        name='error_rate', metric='vendor_error', aggregate='avg', min_samples=2,
+        threshold=0.4, type='error_rate'
+    )])
+    monitor = APIMonitor({}, None, None, None, alert_engine=engine)
+    coalescer = VendorLookupCoalescer(monitor=monitor)
+
+    class StubAdapter:
+        async def search(self, query):
+            return await client.get_json(f"{vendor_server.base_url}/flaky?fail=1&status=503")
+
+    asyncio.run(coalescer.search('stub', StubAdapter(), 'drill', 'drill'))
+    # A 503 then a 200: half the attempts failed although the lookup succeeded
+    [alert] = engine.active()
+    assert alert['vendor'] == 'stub'
+    assert alert['value'] == 0.5
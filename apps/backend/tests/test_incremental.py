@@ -0,0 +1,94 @@
+"""
+ParseSession edits against a full reparse of the same text, including rollback
+"""
+import random
+
+import pytest
+
+from incremental import ParseSession
+from parser import GenericParser
+
+WORDS = ['milk', '2', 'lbs', '32oz', 'apple', 'sony', 'tv', '65', 'inch', 'red', 'x', '6qt']
+
+
+@pytest.fixture(scope='module')
+def parser():
+    return GenericParser()
+
+
+def random_text(rng, max_length=12):
+    pieces = [rng.choice(WORDS + [' ', '\n', '\n\n']) for _ in range(rng.randint(0, max_length))]
+    return ' '.join(pieces)
+
+
+def random_edit(rng, text, lines):
+    if rng.random() < 0.8:
+        offset = rng.randint(0, len(text))
+        delete = rng.randint(0, min(len(text) - offset, 15))
+        return {'type': 'splice', 'offset': offset, 'delete': delete, 'insert': random_text(rng, 3)}
+    start = rng.randint(0, len(lines))
+    end = rng.randint(start, min(len(lines), start + 2))
+    return {'type': 'lines', 'start': start, 'end': end, 'lines': [random_text(rng, 3)]}
+
+
+def expected_text(text, lines, edit):
+    if edit['type'] == 'splice':
+        offset = edit['offset']
+        return text[:offset] + edit['insert'] + text[offset + edit['delete']:]
+    return '\n'.join(lines[:edit['start']] + edit['lines'] + lines[edit['end']:])
+
+
+def assert_matches_full_parse(session, parser, text):
+    assert session.text == text
+    assert session.results == ParseSession(parser, text).results
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_edits_match_a_full_reparse(parser, seed):
+    rng = random.Random(seed)
+    text = '\n'.join(random_text(rng) for _ in range(8))
+    session = ParseSession(parser, text)
+
+    for _ in range(30):
+        edits = []
+        lines = text.split('\n')
+        for _ in range(rng.randint(1, 3)):
+            edit = random_edit(rng, text, lines)
+            edits.append(edit)
+            text = expected_text(text, lines, edit)
+            lines = text.split('\n')
+        session.apply(edits, session.version)
+        assert_matches_full_parse(session, parser, text)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_failed_batch_rolls_back_every_edit(parser, seed):
+    rng = random.Random(seed)
+    text = '\n'.join(random_text(rng) for _ in range(8))
+    session = ParseSession(parser, text)
+
+    for _ in range(20):
+        lines = text.split('\n')
+        good = random_edit(rng, text, lines)
+        bad = {'type': 'splice', 'offset': len(expected_text(text, lines, good)) + 1, 'delete': 0}
+        version = session.version
+
+        with pytest.raises(ValueError):
+            session.apply([good, bad], version)
+        assert session.version == version
+        assert_matches_full_parse(session, parser, text)
+
+        # Later splices still land where the restored text says they should
+        session.apply([good], version)
+        text = expected_text(text, lines, good)
+        assert_matches_full_parse(session, parser, text)
+
+
+def test_only_touched_lines_are_reparsed(parser):
+    session = ParseSession(parser, 'milk 2 lbs\nsony tv\napple')
+
+    result = session.apply([{'type': 'splice', 'offset': 11, 'delete': 4, 'insert': 'samsung'}], 0)
+
+    [change] = result['changes']
+    assert (change['start'], change['end'], change['reparsed']) == (1, 2, [1])
+    assert session.lines == ['milk 2 lbs', 'samsung tv', 'apple']
@@ -0,0 +1,59 @@
+"""
+Measurement canonicalization: canonical tokens and unit-independent cache keys
+"""
+import pytest
+
+from measurements import find_measurements, measurement_key
+from parser import GenericParser
+
+
+@pytest.mark.parametrize('text, match, token, key', [
+    # Same quantity, different units and spellings
+    ('32oz', '32oz', '32oz', 'mass:907g'),
+    ('2 lbs', '2 lbs', '2lb', 'mass:907g'),
+    ('2 pounds', '2 pounds', '2lb', 'mass:907g'),
+    ('6 quart', '6 quart', '6qt', 'volume:5678ml'),
+    ('6qt', '6qt', '6qt', 'volume:5678ml'),
+    ('6 QTS', '6 qts', '6qt', 'volume:5678ml'),
+    # Bare oz is net weight, even on liquids; only "fl oz" is volume
+    ('12 oz sauce', '12 oz', '12oz', 'mass:340g'),
+    ('16 fl oz', '16 fl oz', '16floz', 'volume:473ml'),
+    # Values already in the base unit stay exact
+    ('1001g', '1001g', '1001g', 'mass:1001g'),
+    ('1kg', '1kg', '1kg', 'mass:1000g'),
+    ('946ml', '946ml', '946ml', 'volume:946ml'),
+    ('1qt', '1qt', '1qt', 'volume:946ml'),
+    ('1.5 l', '1.5 l', '1.5l', 'volume:1500ml'),
+    ('256GB', '256gb', '256gb', 'data:256000mb'),
+])
+def test_canonical_token_and_key(text, match, token, key):
+    [(found, measurement)] = list(find_measurements(text.lower()))
+
+    assert found.group(0) == match
+    assert measurement.token == token
+    assert measurement.key == key
+    assert measurement_key(token) == key
+
+
+@pytest.mark.parametrize('text', ['6 in 1 charger', 'size 10', '3 ozone'])
+def test_non_measurements_are_ignored(text):
+    assert list(find_measurements(text.lower())) == []
+
+
+@pytest.mark.parametrize('value', ['6xyz', 'qt', 'twelve oz'])
+def test_measurement_key_rejects_non_tokens(value):
+    assert measurement_key(value) is None
+
+
+@pytest.mark.parametrize('first, second, same', [
+    ('honey 32oz', 'honey 2 lbs', True),
+    ('instant pot 6 quart', 'instant pot 6qt', True),
+    ('juice 12 oz', 'juice 12 fl oz', False),
+    ('flour 1000g', 'flour 1001g', False),
+])
+def test_cache_keys_compare_sizes_in_base_units(first, second, same):
+    parser = GenericParser()
+    [a] = parser.parse(first).products
+    [b] = parser.parse(second).products
+
+    assert (a['cache_key'] == b['cache_key']) is same
@@ -0,0 +1,94 @@
+"""
+ParseExecutor pool dispatch, recovery from dead workers and inline fallback
+"""
+import os
+import signal
+
+import pytest
+
+from parse_executor import ParseExecutor
+from parser import GenericParser
+
+LONG_TEXT = 'organic honey 32oz, dewalt 20v drill and Nike Air Max 90 size 10 ' * 8
+
+
+@pytest.fixture
+def executor():
+    executor = ParseExecutor(max_workers=2, inline_threshold=64, ring_slots=2)
+    yield executor
+    executor.shutdown()
+
+
+@pytest.mark.parametrize('shared_memory', [True, False])
+def test_killed_worker_does_not_fail_the_next_parse(shared_memory):
+    executor = ParseExecutor(max_workers=2, inline_threshold=64, shared_memory=shared_memory)
+    try:
+        executor.warm_up()
+        expected = GenericParser().parse(LONG_TEXT)
+        assert executor.parse(LONG_TEXT) == expected
+        assert executor.stats()['pooled'] == 1
+
+        victim = next(iter(executor._pool._processes.values()))
+        os.kill(victim.pid, signal.SIGKILL)
+        victim.join()
+
+        # This call hits the broken pool, finishes inline and triggers a rebuild
+        assert executor.parse(LONG_TEXT) == expected
+        stats = executor.stats()
+        assert stats['pool_restarts'] == 1
+        assert stats['inline'] == 1
+
+        executor._warming.join(timeout=30)
+        assert executor.stats()['pool_ready']
+        assert executor.parse(LONG_TEXT) == expected
+        assert executor.stats()['pooled'] == 2
+    finally:
+        executor.shutdown()
+
+
+def test_parses_inline_while_warming_up(executor):
+    executor.start_warm_up()
+    assert executor.parse(LONG_TEXT) == GenericParser().parse(LONG_TEXT)
+    executor._warming.join(timeout=30)
+    assert executor.stats()['pool_ready']
+
+
+BATCH = [
+    'organic honey 32oz',
+    'dewalt 20v drill "brushless"',
+    'Nike Air Max 90 size 10',
+    'Sony WH-1000XM5 headphones',
+    'instant pot 6 quart',
+    '',
+    'café crème 2 lbs',
+    'levi 501 jeans 32x30',
+] * 4
+
+
+@pytest.mark.parametrize('shared_memory, ring_slots, slot_size', [
+    (True, 4, 1 << 20),
+    # Smaller ring than the batch: the executor drains its own chunks to free slots
+    (True, 1, 1 << 20),
+    # Slots too small for a chunk's tokens: workers fall back to pickling
+    (True, 2, 256),
+    (False, None, 1 << 20),
+])
+def test_pooled_results_equal_inline(shared_memory, ring_slots, slot_size):
+    executor = ParseExecutor(
+        max_workers=2, inline_threshold=64, chunk_chars=64,
+        shared_memory=shared_memory, ring_slots=ring_slots, slot_size=slot_size
+    )
+    try:
+        executor.warm_up()
+        parser = GenericParser()
+
+        assert executor.parse_batch(BATCH) == [parser.parse(text) for text in BATCH]
+        stats = executor.stats()
+        assert stats['pooled'] == len(BATCH)
+        assert stats['inline'] == 0
+        if not shared_memory or slot_size < 1024:
+            assert stats['shared'] == 0 and stats['pickled'] == stats['tasks']
+        else:
+            assert stats['shared'] == stats['tasks'] > (ring_slots or 0)
+    finally:
+        executor.shutdown()
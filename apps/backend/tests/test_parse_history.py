@@ -0,0 +1,135 @@
+"""
+ParseHistoryStore write-behind batching, lookup and expiry on the SQLite stand-in
+"""
+from datetime import timedelta
+import threading
+import time
+
+import pytest
+
+from storage import ParseHistoryStore, SQLiteHistoryBackend, backend_from_url, text_hash
+from storage.parse_history import TTL_DAYS, _today
+
+
+class RecordingBackend(SQLiteHistoryBackend):
+    """SQLite backend that remembers the size of every batch it was handed"""
+
+    def __init__(self, path=':memory:'):
+        super().__init__(path)
+        self.batch_sizes = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def write_batch(self, rows):
+        self.gate.wait()
+        self.batch_sizes.append(len(rows))
+        super().write_batch(rows)
+
+
+def wait_for(predicate, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError('condition not met in time')
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def backend():
+    return RecordingBackend()
+
+
+def result(confidence=0.9, query='dewalt drill'):
+    return {'products': [{'search_query': query}], 'confidence': confidence}
+
+
+def test_rows_are_written_in_batches(backend):
+    store = ParseHistoryStore(backend, batch_size=3, flush_interval=10)
+    for i in range(7):
+        store.record(f"item {i}", result())
+
+    # Full batches go out without waiting for the flush interval
+    wait_for(lambda: store.stats()['written'] == 6)
+    assert backend.batch_sizes == [3, 3]
+
+    # close() flushes the partial batch left in the queue
+    store.close()
+    assert backend.batch_sizes == [3, 3, 1]
+    assert store.stats()['written'] == 7
+
+
+def test_partial_batch_flushes_after_interval(backend):
+    store = ParseHistoryStore(backend, batch_size=100, flush_interval=0.1)
+    store.record('dewalt drill', result())
+    wait_for(lambda: store.stats()['written'] == 1)
+    assert backend.batch_sizes == [1]
+    store.close()
+
+
+def test_lookup_matches_normalized_text_and_returns_latest(backend):
+    store = ParseHistoryStore(backend, batch_size=1, flush_interval=0.05)
+    store.record('Dewalt  Drill', result(confidence=0.7))
+    wait_for(lambda: store.stats()['written'] == 1)
+    store.record('dewalt drill ', result(confidence=0.8))
+    wait_for(lambda: store.stats()['written'] == 2)
+
+    found = store.lookup('DEWALT drill')
+    assert found['result']['confidence'] == 0.8
+    assert store.lookup('dewalt drill', kind='product_match') is None
+    assert store.lookup('makita drill') is None
+    store.close()
+
+
+def test_full_queue_drops_instead_of_blocking(backend):
+    backend.gate.clear()  # Writer stalls, as if the database were slow
+    store = ParseHistoryStore(backend, batch_size=1, flush_interval=0.01, max_queue=2)
+
+    started = time.perf_counter()
+    for i in range(20):
+        store.record(f"item {i}", result())
+    assert time.perf_counter() - started < 0.5
+    assert store.stats()['dropped'] > 0
+
+    backend.gate.set()
+    store.close()
+
+
+def test_rows_expire_by_kind_ttl(backend):
+    today = _today()
+    digest = text_hash('dewalt drill')
+    backend.write_batch([
+        (digest, 'parse', 'dewalt drill', '{"confidence": 0.5}', 0.5, 1.0,
+         (today - timedelta(days=1)).isoformat()),
+        (digest, 'product_match', 'dewalt drill', '{"confidence": 0.6}', 0.6, 2.0,
+         today.isoformat()),
+    ])
+
+    # Expired rows are invisible to lookups before the purge runs
+    assert backend.lookup(digest, 'parse') is None
+    assert backend.lookup(digest, 'product_match')['result'] == {'confidence': 0.6}
+
+    assert backend.purge_expired() == 1
+    assert backend.purge_expired() == 0
+    assert backend.lookup(digest, 'product_match') is not None
+
+
+def test_record_sets_expiry_from_kind(backend):
+    store = ParseHistoryStore(backend, batch_size=2, flush_interval=0.05)
+    store.record('dewalt drill', result())
+    store.record('dewalt drill', result(), kind='product_match')
+    wait_for(lambda: store.stats()['written'] == 2)
+
+    rows = dict(backend._conn.execute('SELECT kind, expires_on FROM parse_history'))
+    assert rows['parse'] == (_today() + timedelta(days=TTL_DAYS['parse'])).isoformat()
+    assert rows['product_match'] == (_today() + timedelta(days=TTL_DAYS['product_match'])).isoformat()
+    store.close()
+
+
+def test_backend_from_url(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert backend_from_url('sqlite://').path == ':memory:'
+    assert backend_from_url('sqlite:///history.db').path == 'history.db'
+    absolute = tmp_path / 'absolute.db'
+    assert backend_from_url(f"sqlite:///{absolute}").path == str(absolute)
+    with pytest.raises(ValueError):
+        backend_from_url('mysql://localhost/snapstack')
@@ -0,0 +1,120 @@
+"""
+PatternRegistry validation, trial parsing and hot swap of published configs
+"""
+import copy
+import json
+import shutil
+
+import pytest
+
+from parser import GenericParser
+from pattern_registry import DEFAULT_PATTERNS, PatternConfigError, PatternRegistry
+
+
+@pytest.fixture
+def registry(tmp_path):
+    path = tmp_path / 'patterns.json'
+    shutil.copy(DEFAULT_PATTERNS, path)
+    return PatternRegistry(str(path), check_interval=0)
+
+
+@pytest.fixture
+def config(registry):
+    return copy.deepcopy(registry.current().config)
+
+
+def next_version(config):
+    config['version'] += 1
+    return config
+
+
+def test_publish_swaps_in_new_patterns(registry, config):
+    parser = GenericParser(registry=registry)
+    assert not any(t.type == 'sku' for t in parser.parse('widget SKU-1234').tokens)
+
+    config['patterns'].insert(0, {
+        'name': 'sku', 'type': 'sku', 'pattern': r'SKU-(\d+)', 'confidence': 0.9
+    })
+    published = registry.publish(next_version(config))
+
+    assert registry.current() is published
+    tokens = parser.parse('widget SKU-1234').tokens
+    assert [t.value for t in tokens if t.type == 'sku'] == ['1234']
+    with open(registry.path) as f:
+        assert json.load(f)['version'] == config['version']
+
+
+def test_optional_group_that_does_not_match_is_skipped(registry, config):
+    config['patterns'].insert(0, {
+        'name': 'optional', 'type': 'model', 'pattern': r'(zz)?\d', 'confidence': 0.9
+    })
+    registry.publish(next_version(config))
+    result = GenericParser(registry=registry).parse('iPhone 15 Pro 256GB')
+    assert all(token.value for token in result.tokens)
+
+
+@pytest.mark.parametrize('change, message', [
+    (lambda c: c.update(stop_words=[1]), 'stop_words'),
+    (lambda c: c['patterns'][0].update(name=['a']), 'names'),
+    (lambda c: c['patterns'][0].update(name=''), 'names'),
+    (lambda c: c['patterns'][0].update(type=5), 'token type'),
+    (lambda c: c['patterns'][0].update(group='x'), 'group'),
+    (lambda c: c['patterns'][0].update(group=3), 'no group'),
+    (lambda c: c['patterns'][0].update(pattern=None), 'must be a string'),
+    (lambda c: c['patterns'][0].update(pattern='('), 'invalid regex'),
+    (lambda c: c['patterns'][0].update(confidence=2), 'confidence'),
+    (lambda c: c['patterns'][0].update(kind='magic'), 'kind'),
+])
+def test_invalid_configs_are_rejected(registry, config, change, message):
+    active = registry.current()
+    change(config)
+    with pytest.raises(PatternConfigError, match=message):
+        registry.publish(next_version(config))
+    assert registry.current() is active
+
+
+def test_config_that_breaks_a_parse_is_rejected(registry, config, monkeypatch):
+    import pattern_registry
+
+    original = pattern_registry.CompiledPattern.matches
+
+    def broken(self, text, lowered, dictionary):
+        if self.name == 'broken':
+            raise RuntimeError('pattern blew up')
+        return original(self, text, lowered, dictionary)
+
+    monkeypatch.setattr(pattern_registry.CompiledPattern, 'matches', broken)
+    config['patterns'].append({
+        'name': 'broken', 'type': 'model', 'pattern': r'(\w+)', 'confidence': 0.5
+    })
+    active = registry.current()
+    with pytest.raises(PatternConfigError, match='sample inputs'):
+        registry.publish(next_version(config))
+    assert registry.current() is active
+
+
+def test_stale_version_is_rejected(registry, config):
+    with pytest.raises(PatternConfigError, match='not newer'):
+        registry.publish(config)
+
+
+def test_hit_rate_stays_a_rate(registry):
+    parser = GenericParser(registry=registry)
+    parser.parse('1 2 3 4 5 6 7 8 9')
+    stats = {p['name']: p for p in registry.current().stats()}
+    number = stats['standalone_number']
+    assert number['hit_rate'] == 1.0
+    assert number['hits_per_parse'] == 9
+
+
+def test_put_patterns_rejects_bad_config_with_400(registry, config, monkeypatch):
+    from app import app
+    import subsystems
+
+    monkeypatch.setattr(subsystems.get('parser'), 'registry', registry)
+    client = app.test_client()
+
+    config['stop_words'] = [1]
+    response = client.put('/api/admin/parser/patterns', json=next_version(config))
+    assert response.status_code == 400
+    assert client.post('/api/admin/parser/test', json={'text': 'dewalt drill'}).status_code == 200
@@ -0,0 +1,68 @@
+"""
+Profiler sampler lifecycle and the parse stage spans recorded for sampled requests
+"""
+import pytest
+
+from parse_executor import ParseExecutor
+from parser import GenericParser
+from profiling import Profiler
+
+LONG_TEXT = 'organic honey 32oz, dewalt 20v drill and Nike Air Max 90 size 10 ' * 4
+
+
+@pytest.fixture
+def profiler():
+    return Profiler(sample_rate=1.0, interval_ms=1)
+
+
+def span_names(profile):
+    return {(span['name'], span['parent']) for span in profile.spans}
+
+
+def test_sampler_stops_when_no_request_is_profiled(profiler):
+    profile = profiler.start_request('GET /parse')
+    sampler = profiler._sampler
+    assert sampler.is_alive()
+    GenericParser().parse(LONG_TEXT * 20)
+    profiler.finish_request(profile)
+
+    sampler.join(timeout=1)
+    assert not sampler.is_alive()
+    assert profiler._sampler is None
+    assert profile.samples > 0
+
+    # The next sampled request gets a fresh sampler
+    profile = profiler.start_request('GET /parse')
+    assert profiler._sampler is not None and profiler._sampler is not sampler
+    profiler.finish_request(profile)
+
+
+def test_inline_parse_records_stage_spans(profiler):
+    parser = GenericParser()
+    profile = profiler.start_request('POST /api/parse')
+    parser.parse(LONG_TEXT)
+    profiler.finish_request(profile)
+
+    assert {
+        ('tokenize', None),
+        ('dictionary_match', 'tokenize'),
+        ('measurements', 'tokenize'),
+        ('patterns', 'tokenize'),
+        ('build_products', None),
+    } <= span_names(profile)
+    assert set(profiler.summary()['spans']) >= {'tokenize', 'dictionary_match', 'measurements'}
+
+
+def test_pooled_parse_records_dispatch_span(profiler):
+    executor = ParseExecutor(max_workers=1, inline_threshold=64)
+    try:
+        executor.warm_up()
+        profile = profiler.start_request('POST /api/admin/parser/test')
+        executor.parse(LONG_TEXT)
+        profiler.finish_request(profile)
+    finally:
+        executor.shutdown()
+
+    assert ('pool_dispatch', None) in span_names(profile)
+    # Parsing happened in the worker, not under this request's spans
+    assert 'tokenize' not in {name for name, _ in span_names(profile)}
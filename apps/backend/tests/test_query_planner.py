@@ -0,0 +1,210 @@
+"""
+Vendor lookup coalescing, leader takeover and budget routing of whole stacks
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from adapters import CostLedger, LedgerConfig, VendorLookupCoalescer, plan_queries, search_stack
+
+
+class StubAdapter:
+    """Records every search; returns '<name>:<query>' after an optional delay"""
+
+    def __init__(self, name='amazon', delay=0.0, error=None):
+        self.name = name
+        self.delay = delay
+        self.error = error
+        self.queries = []
+
+    async def search(self, query):
+        self.queries.append(query)
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return f"{self.name}:{query}"
+
+
+class BlockFirstAdapter(StubAdapter):
+    """The first search never finishes on its own; later ones return at once"""
+
+    async def search(self, query):
+        self.queries.append(query)
+        if len(self.queries) == 1:
+            await asyncio.Event().wait()
+        return f"{self.name}:{query}:{len(self.queries)}"
+
+
+@pytest.fixture
+def ledger():
+    ledger = CostLedger(LedgerConfig(
+        cost_per_call={'amazon': 1.0, 'ebay': 0.1, 'walmart': 0.5},
+        monthly_budgets={'amazon': 10.0}
+    ))
+    yield ledger
+    ledger.close()
+
+
+def test_plan_collapses_equivalent_queries():
+    plan = plan_queries([
+        {'search_query': 'honey 32oz', 'cache_key': 'honey|mass:907g'},
+        {'search_query': 'honey 2 lbs', 'cache_key': 'honey|mass:907g'},
+        {'search_query': 'Drill DeWalt'},
+        {'search_query': 'dewalt drill'},
+        {'search_query': ''},
+    ])
+
+    assert plan.queries == {'honey|mass:907g': 'honey 32oz', 'dewalt drill': 'Drill DeWalt'}
+    assert plan.assignments == [
+        'honey|mass:907g', 'honey|mass:907g', 'dewalt drill', 'dewalt drill', None
+    ]
+    assert plan.duplicates_removed == 2
+
+
+def test_concurrent_lookups_share_one_call():
+    coalescer = VendorLookupCoalescer()
+    adapter = StubAdapter(delay=0.05)
+
+    async def lookups():
+        return await asyncio.gather(*(
+            coalescer.search('amazon', adapter, 'drill', 'drill') for _ in range(5)
+        ))
+
+    assert asyncio.run(lookups()) == ['amazon:drill'] * 5
+    assert adapter.queries == ['drill']
+    stats = coalescer.stats()
+    assert (stats['vendor_calls'], stats['coalesced'], stats['in_flight']) == (1, 4, 0)
+
+    # Within the window the result is reused without a call
+    assert asyncio.run(coalescer.search('amazon', adapter, 'drill', 'drill')) == 'amazon:drill'
+    assert adapter.queries == ['drill']
+    assert coalescer.stats()['recent_hits'] == 1
+
+
+def test_lookups_on_different_event_loops_share_one_call():
+    coalescer = VendorLookupCoalescer()
+    adapter = StubAdapter(delay=0.3)
+    results = []
+
+    leader = threading.Thread(
+        target=lambda: results.append(asyncio.run(coalescer.search('amazon', adapter, 'tv', 'tv')))
+    )
+    leader.start()
+    time.sleep(0.05)
+    results.append(asyncio.run(coalescer.search('amazon', adapter, 'tv', 'tv')))
+    leader.join()
+
+    assert results == ['amazon:tv', 'amazon:tv']
+    assert adapter.queries == ['tv']
+
+
+def test_follower_takes_over_when_the_leader_is_cancelled():
+    coalescer = VendorLookupCoalescer()
+    adapter = BlockFirstAdapter()
+
+    async def scenario():
+        leader = asyncio.create_task(coalescer.search('amazon', adapter, 'tv', 'tv'))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(coalescer.search('amazon', adapter, 'tv', 'tv'))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(scenario()) == 'amazon:tv:2'
+    stats = coalescer.stats()
+    assert (stats['vendor_calls'], stats['coalesced'], stats['in_flight']) == (2, 1, 0)
+
+
+def test_cancelled_follower_leaves_the_shared_call_running():
+    coalescer = VendorLookupCoalescer()
+    adapter = StubAdapter(delay=0.05)
+
+    async def scenario():
+        leader = asyncio.create_task(coalescer.search('amazon', adapter, 'tv', 'tv'))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(coalescer.search('amazon', adapter, 'tv', 'tv'))
+        await asyncio.sleep(0)
+        follower.cancel()
+        # A later request still joins the same call
+        late = asyncio.create_task(coalescer.search('amazon', adapter, 'tv', 'tv'))
+        return await asyncio.gather(leader, late)
+
+    assert asyncio.run(scenario()) == ['amazon:tv', 'amazon:tv']
+    assert adapter.queries == ['tv']
+    assert coalescer.stats()['coalesced'] == 2
+
+
+def test_leader_error_reaches_followers_and_is_billed_once(ledger):
+    coalescer = VendorLookupCoalescer(ledger=ledger)
+    adapter = StubAdapter(delay=0.05, error=ValueError('vendor down'))
+
+    async def lookups():
+        return await asyncio.gather(
+            *(coalescer.search('ebay', adapter, 'tv', 'tv') for _ in range(3)),
+            return_exceptions=True
+        )
+
+    assert [str(e) for e in asyncio.run(lookups())] == ['vendor down'] * 3
+    assert adapter.queries == ['tv']
+    assert ledger.vendor_summary('ebay')['calls_today'] == 1
+
+
+def test_stack_makes_one_lookup_per_unique_query():
+    coalescer = VendorLookupCoalescer()
+    adapter = StubAdapter()
+    products = [{'search_query': 'honey'}, {'search_query': 'HONEY'}, {}, {'search_query': 'tea'}]
+
+    results = asyncio.run(search_stack(products, 'amazon', adapter, coalescer))
+
+    assert results == ['amazon:honey', 'amazon:honey', None, 'amazon:tea']
+    assert sorted(adapter.queries) == ['honey', 'tea']
+
+
+def test_exhausted_budget_reroutes_the_stack_to_a_vendor_within_budget(ledger):
+    coalescer = VendorLookupCoalescer(ledger=ledger)
+    amazon, ebay = StubAdapter('amazon'), StubAdapter('ebay')
+    ledger.record('amazon', calls=10)
+
+    results = asyncio.run(search_stack(
+        [{'search_query': 'tea'}], 'amazon', amazon, coalescer, ledger=ledger,
+        alternatives={'ebay': ebay}
+    ))
+
+    assert results == ['ebay:tea']
+    assert amazon.queries == []
+    assert ledger.summary()['routing']['rerouted'] == 1
+
+
+def test_at_risk_budget_moves_to_the_cheapest_vendor(ledger):
+    coalescer = VendorLookupCoalescer(ledger=ledger)
+    amazon = StubAdapter('amazon')
+    alternatives = {'walmart': StubAdapter('walmart'), 'ebay': StubAdapter('ebay')}
+    # 9 of 10 spent in the last hour projects far past the budget
+    ledger.record('amazon', calls=9)
+
+    results = asyncio.run(search_stack(
+        [{'search_query': 'tea'}], 'amazon', amazon, coalescer, ledger=ledger,
+        alternatives=alternatives
+    ))
+
+    assert results == ['ebay:tea']
+
+
+def test_exhausted_budget_without_alternatives_serves_cached_results_only(ledger):
+    coalescer = VendorLookupCoalescer(ledger=ledger)
+    adapter = StubAdapter()
+    asyncio.run(coalescer.search('amazon', adapter, 'tea', 'tea'))
+    ledger.record('amazon', calls=10)
+
+    results = asyncio.run(search_stack(
+        [{'search_query': 'tea'}, {'search_query': 'honey'}], 'amazon', adapter, coalescer,
+        ledger=ledger
+    ))
+
+    assert results == ['amazon:tea', None]
+    assert adapter.queries == ['tea']
+    assert ledger.summary()['routing']['cache_only'] == 1
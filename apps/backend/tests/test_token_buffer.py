@@ -0,0 +1,54 @@
+"""
+TokenRing slot writes and zero-copy reads, capacity limits and slot handout
+"""
+import pytest
+
+from parser import GenericParser, Token
+from token_buffer import TokenRing
+
+
+@pytest.fixture
+def ring():
+    ring = TokenRing.create(slots=2, slot_size=4096)
+    yield ring
+    ring.close()
+
+
+def test_round_trip_matches_the_parsed_tokens(ring):
+    parser = GenericParser()
+    token_lists = [
+        parser.parse(text).tokens
+        for text in ('organic honey 32oz', '', 'dewalt 20v drill "brushless"', 'café 2 lbs')
+    ]
+    token_lists.append([Token('ünïcode', 'keyword', 0.6, 3, None)])
+
+    slot = ring.acquire()
+    spans = ring.write(slot, token_lists)
+
+    assert [count for _, count in spans] == [len(tokens) for tokens in token_lists]
+    for (start, count), tokens in zip(spans, token_lists):
+        view = ring.view(slot, start, count)
+        assert view.tokens() == tokens
+        view.release()
+    ring.release(slot)
+
+
+def test_write_refuses_what_does_not_fit(ring):
+    slot = ring.acquire()
+    too_many = [Token('x', 'keyword', 0.6, i, None) for i in range(ring.layout.capacity + 1)]
+    too_long = [Token('x' * (ring.layout.arena_size + 1), 'keyword', 0.6, 0, None)]
+    unknown_type = [Token('x', 'emoji', 0.6, 0, None)]
+
+    assert ring.write(slot, [too_many]) is None
+    assert ring.write(slot, [too_long]) is None
+    assert ring.write(slot, [unknown_type]) is None
+    ring.release(slot)
+
+
+def test_full_ring_hands_out_no_slot_until_one_is_released(ring):
+    first, second = ring.acquire(), ring.acquire()
+    assert {first, second} == {0, 1}
+    assert ring.try_acquire() is None
+
+    ring.release(second)
+    assert ring.try_acquire() == second
@@ -0,0 +1,319 @@
+"""
+Dictionary Matcher - Aho-Corasick brand/vocabulary matching in one linear pass
+The automaton is compiled at build time into a flat binary file and
+memory-mapped, so every parse worker shares the same pages instead of rebuilding it
+
+Usage:
+    python dictionary_matcher.py build ../data/brands.txt ../data/brands.acd
+"""
+from typing import Dict, Iterable, List, NamedTuple, Optional
+from array import array
+from collections import deque
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'SSAC'
+FORMAT_VERSION = 2
+# Edge labels are ASCII codes; any other character sends the automaton back to the root
+ALPHABET = 128
+_HEADER = struct.Struct('<4sIIIII')  # magic, version, states, edges, patterns, string bytes
+_LABELS = [bytes((code,)) for code in range(ALPHABET)]
+
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../data'))
+DEFAULT_VOCABULARY = os.path.join(DATA_DIR, 'brands.txt')
+DEFAULT_AUTOMATON = os.path.join(DATA_DIR, 'brands.acd')
+
+
+class DictionaryMatch(NamedTuple):
+    start: int
+    end: int
+    entry: str
+
+
+def read_vocabulary(path: str) -> List[str]:
+    """Read one entry per line, skipping blanks and # comments"""
+    entries = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                entries.append(line.lower())
+    return entries
+
+
+def build_automaton(entries: Iterable[str]) -> bytes:
+    """
+    Compile entries into the serialized automaton format
+
+    Layout (all little-endian, 4-byte aligned):
+        header | root[128] | edge_start[states + 1] | edge_target[edges]
+               | fail[states] | output[states] | link[states]
+               | entry_offset[patterns] | entry_length[patterns]
+               | edge_label[edges] (bytes) | ascii strings
+    Only trie edges are stored, sorted by label per state; the matcher follows
+    fail links at runtime, so the file grows with the vocabulary, not with
+    states * alphabet. root is the dense first row. output[s] is 1 + the entry
+    id ending at s (0 = none); link[s] is the next state on the suffix chain
+    that also has an output (0 = none).
+    """
+    patterns = sorted(set(entry.lower() for entry in entries if entry))
+    for pattern in patterns:
+        if not pattern.isascii():
+            raise ValueError(f"Dictionary entries must be ASCII: {pattern!r}")
+
+    # Trie
+    goto: List[Dict[int, int]] = [{}]
+    output = [0]
+    for pattern_id, pattern in enumerate(patterns):
+        state = 0
+        for ch in pattern:
+            code = ord(ch)
+            if code not in goto[state]:
+                goto.append({})
+                output.append(0)
+                goto[state][code] = len(goto) - 1
+            state = goto[state][code]
+        output[state] = pattern_id + 1
+
+    # Failure links by BFS; children of the root fail back to the root
+    states = len(goto)
+    fail = [0] * states
+    link = [0] * states
+    queue = deque(goto[0].values())
+    while queue:
+        state = queue.popleft()
+        fallback = fail[state]
+        link[state] = fallback if output[fallback] else link[fallback]
+        for code, target in goto[state].items():
+            fallback = fail[state]
+            while fallback and code not in goto[fallback]:
+                fallback = fail[fallback]
+            fail[target] = goto[fallback].get(code, 0)
+            queue.append(target)
+
+    root = array('I', (goto[0].get(code, 0) for code in range(ALPHABET)))
+    edge_start = array('I')
+    edge_target = array('I')
+    edge_label = bytearray()
+    for node in goto:
+        edge_start.append(len(edge_target))
+        for code in sorted(node):
+            edge_label.append(code)
+            edge_target.append(node[code])
+    edge_start.append(len(edge_target))
+
+    encoded = [pattern.encode('ascii') for pattern in patterns]
+    offsets = array('I')
+    lengths = array('I')
+    position = 0
+    for data in encoded:
+        offsets.append(position)
+        lengths.append(len(data))
+        position += len(data)
+    strings = b''.join(encoded)
+
+    tables = [
+        root, edge_start, edge_target,
+        array('I', fail), array('I', output), array('I', link),
+        offsets, lengths
+    ]
+    if sys.byteorder != 'little':
+        for table in tables:
+            table.byteswap()
+
+    return b''.join([
+        _HEADER.pack(
+            MAGIC, FORMAT_VERSION, states, len(edge_target), len(patterns), len(strings)
+        ),
+        *(table.tobytes() for table in tables),
+        bytes(edge_label),
+        strings
+    ])
+
+
+def write_automaton(entries: Iterable[str], path: str):
+    """Compile and write atomically, so concurrent loaders never see a partial file"""
+    data = build_automaton(entries)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class DictionaryMatcher:
+    """
+    Matches every dictionary entry in a single pass over the text
+
+    Tables are memoryviews over a read-only mmap (or an in-memory buffer),
+    so loading costs nothing beyond mapping the file.
+    """
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+        view = memoryview(buffer)
+        magic, version, states, edges, patterns, string_bytes = _HEADER.unpack_from(view, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("Not a dictionary automaton (or wrong format version)")
+        if sys.byteorder != 'little':
+            raise ValueError("Dictionary automata are little-endian only")
+
+        offset = _HEADER.size
+
+        def table(count: int) -> memoryview:
+            nonlocal offset
+            section = view[offset:offset + count * 4].cast('I')
+            offset += count * 4
+            return section
+
+        self.states = states
+        self._root = table(ALPHABET)
+        self._edge_start = table(states + 1)
+        self._edge_target = table(edges)
+        self._fail = table(states)
+        self._output = table(states)
+        self._link = table(states)
+        self._entry_offsets = table(patterns)
+        self._entry_lengths = table(patterns)
+        # Labels are searched in place with buffer.find (bytes and mmap both have it)
+        self._labels_offset = offset
+        offset += edges
+        self._strings = view[offset:offset + string_bytes]
+        self._entries: Dict[int, str] = {}
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[str]) -> 'DictionaryMatcher':
+        return cls(build_automaton(entries))
+
+    @classmethod
+    def load(cls, path: str) -> 'DictionaryMatcher':
+        """Memory-map a compiled automaton (pages are shared across processes)"""
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapped)
+
+    def __len__(self) -> int:
+        return len(self._entry_offsets)
+
+    def _entry(self, pattern_id: int) -> str:
+        entry = self._entries.get(pattern_id)
+        if entry is None:
+            offset = self._entry_offsets[pattern_id]
+            entry = str(self._strings[offset:offset + self._entry_lengths[pattern_id]], 'ascii')
+            self._entries[pattern_id] = entry
+        return entry
+
+    def find_all(self, text: str) -> List[DictionaryMatch]:
+        """Every entry occurrence in text that sits on word boundaries"""
+        root = self._root
+        edge_start = self._edge_start
+        edge_target = self._edge_target
+        fail = self._fail
+        find_label = self._buffer.find
+        labels = self._labels_offset
+        output = self._output
+        link = self._link
+        lengths = self._entry_lengths
+        lowered = text.lower()
+        # lower() can change length for a few non-ASCII characters
+        if len(lowered) != len(text):
+            lowered = ''.join(ch.lower() if len(ch.lower()) == 1 else ch for ch in text)
+
+        matches = []
+        state = 0
+        for index, ch in enumerate(lowered):
+            code = ord(ch)
+            if code >= ALPHABET:
+                state = 0
+                continue
+            # Follow fail links until some state has an edge for this character
+            while state:
+                position = find_label(
+                    _LABELS[code], labels + edge_start[state], labels + edge_start[state + 1]
+                )
+                if position >= 0:
+                    state = edge_target[position - labels]
+                    break
+                state = fail[state]
+            else:
+                state = root[code]
+
+            hit = state if output[state] else link[state]
+            while hit:
+                pattern_id = output[hit] - 1
+                end = index + 1
+                start = end - lengths[pattern_id]
+                if _is_boundary(lowered, start - 1) and _is_boundary(lowered, end):
+                    matches.append(DictionaryMatch(start, end, self._entry(pattern_id)))
+                hit = link[hit]
+        return matches
+
+    def find_longest(self, text: str) -> List[DictionaryMatch]:
+        """Leftmost-longest, non-overlapping matches"""
+        selected = []
+        covered_until = 0
+        for match in sorted(self.find_all(text), key=lambda m: (m.start, -m.end)):
+            if match.start >= covered_until:
+                selected.append(match)
+                covered_until = match.end
+        return selected
+
+
+def _is_boundary(text: str, index: int) -> bool:
+    return index < 0 or index >= len(text) or not text[index].isalnum()
+
+
+_default_matcher: Optional[DictionaryMatcher] = None
+_default_lock = threading.Lock()
+
+
+def load_default_matcher() -> DictionaryMatcher:
+    """
+    Load the shared brand dictionary compiled by the build step
+
+    PARSER_DICTIONARY overrides the compiled automaton path. Compiling is a
+    build/deploy task (`npm run build:dictionary` in packages/parser); when
+    the default file is missing, stale or from an older format, the automaton
+    is compiled in memory instead and each process then holds its own copy.
+    """
+    global _default_matcher
+    if _default_matcher is None:
+        with _default_lock:
+            if _default_matcher is None:
+                path = os.environ.get('PARSER_DICTIONARY', DEFAULT_AUTOMATON)
+                try:
+                    if (path == DEFAULT_AUTOMATON and
+                            os.path.getmtime(path) < os.path.getmtime(DEFAULT_VOCABULARY)):
+                        raise ValueError(f"older than {DEFAULT_VOCABULARY}")
+                    _default_matcher = DictionaryMatcher.load(path)
+                except (OSError, ValueError) as e:
+                    if path != DEFAULT_AUTOMATON:
+                        raise
+                    logger.warning(
+                        "Cannot use %s (%s); compiling the brand dictionary in memory. "
+                        "Run `npm run build:dictionary` in packages/parser when deploying",
+                        path, e
+                    )
+                    _default_matcher = DictionaryMatcher.from_entries(
+                        read_vocabulary(DEFAULT_VOCABULARY)
+                    )
+    return _default_matcher
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 4 or sys.argv[1] != 'build':
+        print(__doc__)
+        sys.exit(1)
+    vocabulary = read_vocabulary(sys.argv[2])
+    write_automaton(vocabulary, sys.argv[3])
+    print(f"Compiled {len(set(vocabulary))} entries to {sys.argv[3]}")
@@ -0,0 +1,221 @@
+"""
+Incremental Parsing - Line-segmented parse sessions for the Parser Studio editor
+A session keeps the document as lines with a cached parse per line; edits only
+re-tokenize the lines they touch and report just those lines back
+"""
+from typing import List, Dict, Any, Optional, Tuple
+from collections import OrderedDict
+from dataclasses import asdict
+from bisect import bisect_right
+import threading
+import time
+import uuid
+
+from parser import GenericParser
+
+
+class StaleSessionError(Exception):
+    """Edit was made against an older version than the server holds"""
+
+
+class ParseSession:
+    """
+    One document being edited
+
+    Each line is parsed on its own, so a product's tokens never depend on
+    other lines; that is what lets an edit leave every other line untouched.
+    """
+
+    def __init__(self, parser: GenericParser, text: str = ''):
+        self.parser = parser
+        self.version = 0
+        self.lines: List[str] = text.split('\n')
+        self.results: List[Dict[str, Any]] = [self._parse_line(line) for line in self.lines]
+        self.updated_at = time.time()
+        self._lock = threading.Lock()
+        # Line start offsets; only the first _starts_valid are current. An edit
+        # invalidates from its first line on, and splices extend the valid
+        # prefix just far enough to find their lines
+        self._starts: List[int] = [0] * len(self.lines)
+        self._starts_valid = 0
+        self._size = sum(len(line) + 1 for line in self.lines)  # Text plus one newline per line
+
+    def _parse_line(self, line: str) -> Dict[str, Any]:
+        result = self.parser.parse(line)
+        return {
+            'products': result.products,
+            'tokens': [asdict(token) for token in result.tokens],
+            'confidence': result.confidence
+        }
+
+    @property
+    def text(self) -> str:
+        return '\n'.join(self.lines)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {'version': self.version, 'lines': self.results}
+
+    def apply(self, edits: List[Dict[str, Any]], base_version: int) -> Dict[str, Any]:
+        """
+        Apply edits made against base_version
+
+        Edits are either line replacements
+            {"type": "lines", "start": 3, "end": 4, "lines": ["new text"]}
+        or character splices on the whole document
+            {"type": "splice", "offset": 120, "delete": 2, "insert": "oz"}
+
+        Returns the new version and, per edit, the replaced line range with
+        results for only the lines that now occupy it.
+        """
+        with self._lock:
+            if base_version != self.version:
+                raise StaleSessionError(
+                    f"Edit based on version {base_version}, session is at {self.version}"
+                )
+            if not isinstance(edits, list):
+                raise ValueError('"edits" must be a list')
+            # Edits in one request apply all-or-nothing; undo holds what each replaced
+            undo = []
+            try:
+                changes = [self._apply_edit(edit, undo) for edit in edits]
+            except Exception:
+                for start, count, lines, results in reversed(undo):
+                    self._set_lines(start, start + count, lines, results)
+                raise
+            self.version += 1
+            self.updated_at = time.time()
+            return {'version': self.version, 'changes': changes}
+
+    def _apply_edit(self, edit: Dict[str, Any], undo: List[tuple]) -> Dict[str, Any]:
+        if not isinstance(edit, dict):
+            raise ValueError("Each edit must be an object")
+        edit_type = edit.get('type')
+        if edit_type == 'lines':
+            start, end = int(edit['start']), int(edit['end'])
+            new_lines = edit['lines']
+            if not isinstance(new_lines, list) or not all(isinstance(line, str) for line in new_lines):
+                raise ValueError('"lines" must be a list of strings')
+            # An item containing newlines is several lines; keep one entry per line
+            new_lines = [part for line in new_lines for part in line.split('\n')]
+        elif edit_type == 'splice':
+            insert = edit.get('insert', '')
+            if not isinstance(insert, str):
+                raise ValueError('"insert" must be a string')
+            start, end, new_lines = self._splice_to_lines(
+                int(edit['offset']), int(edit.get('delete', 0)), insert
+            )
+        else:
+            raise ValueError(f"Unknown edit type: {edit_type}")
+
+        if not 0 <= start <= end <= len(self.lines):
+            raise ValueError(f"Line range {start}:{end} outside document")
+        return self._replace_lines(start, end, new_lines, undo)
+
+    def _splice_to_lines(self, offset: int, delete: int, insert: str):
+        """Turn a character splice into a replacement of the lines it touches"""
+        if offset < 0 or delete < 0 or offset + delete > self._size - 1:
+            raise ValueError("Splice outside document")
+
+        first = self._line_at(offset)
+        last = self._line_at(offset + delete)
+        segment = '\n'.join(self.lines[first:last + 1])
+        local = offset - self._starts[first]
+        segment = segment[:local] + insert + segment[local + delete:]
+        return first, last + 1, segment.split('\n')
+
+    def _line_at(self, offset: int) -> int:
+        """Index of the line containing offset, computing line starts only as far as needed"""
+        lines, starts = self.lines, self._starts
+        valid = self._starts_valid
+        if valid == 0:
+            starts[0] = 0
+            valid = 1
+        while valid < len(lines) and starts[valid - 1] <= offset:
+            starts[valid] = starts[valid - 1] + len(lines[valid - 1]) + 1
+            valid += 1
+        self._starts_valid = valid
+        return bisect_right(starts, offset, 0, valid) - 1
+
+    def _set_lines(self, start: int, end: int, lines: List[str], results: List[Dict[str, Any]]):
+        """Replace lines[start:end], keeping the size and line starts before start"""
+        self._size += sum(len(line) + 1 for line in lines)
+        self._size -= sum(len(line) + 1 for line in self.lines[start:end])
+        self.lines[start:end] = lines
+        self.results[start:end] = results
+        self._starts[start:end] = [0] * len(lines)
+        self._starts_valid = min(self._starts_valid, start)
+
+    def _replace_lines(
+        self, start: int, end: int, new_lines: List[str], undo: List[tuple]
+    ) -> Dict[str, Any]:
+        old_lines = self.lines[start:end]
+        old_results = self.results[start:end]
+
+        new_results = []
+        changed = []
+        for i, line in enumerate(new_lines):
+            # Typing inside one line rarely changes its neighbours in the range
+            if i < len(old_lines) and old_lines[i] == line:
+                new_results.append(old_results[i])
+            else:
+                new_results.append(self._parse_line(line))
+                changed.append(start + i)
+
+        undo.append((start, len(new_lines), old_lines, old_results))
+        self._set_lines(start, end, new_lines, new_results)
+        return {
+            'start': start,
+            'end': end,
+            'lines': new_results,
+            'reparsed': changed
+        }
+
+
+class ParseSessionStore:
+    """
+    In-memory session registry with LRU eviction and idle expiry
+
+    Sessions live in the worker that created them, so multi-worker
+    deployments need sticky routing for the session endpoints.
+    """
+
+    def __init__(self, parser: GenericParser, max_sessions: int = 500, ttl_seconds: int = 1800):
+        self.parser = parser
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions: 'OrderedDict[str, ParseSession]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, text: str) -> Tuple[str, ParseSession]:
+        session = ParseSession(self.parser, text)
+        session_id = uuid.uuid4().hex
+        with self._lock:
+            self._sessions[session_id] = session
+            self._evict()
+        return session_id, session
+
+    def get(self, session_id: str) -> Optional[ParseSession]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            if time.time() - session.updated_at > self.ttl_seconds:
+                del self._sessions[session_id]
+                return None
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def _evict(self):
+        now = time.time()
+        expired = [
+            session_id for session_id, session in self._sessions.items()
+            if now - session.updated_at > self.ttl_seconds
+        ]
+        for session_id in expired:
+            del self._sessions[session_id]
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
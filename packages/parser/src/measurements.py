@@ -0,0 +1,137 @@
+"""
+Measurements - Canonical unit handling for measurement tokens
+One precomputed unit table drives extraction, canonical spelling ("6 quart" and
+"6qts" both become "6qt") and base-unit cache keys (32oz and 2lb share a key)
+"""
+from typing import Dict, NamedTuple, Optional
+import math
+import re
+
+
+class Unit(NamedTuple):
+    canonical: str  # Spelling used in tokens and vendor queries
+    dimension: str
+    to_base: float  # Multiplier into the dimension's base unit
+
+
+# Base units: mass g, volume ml, length mm, data mb, count ct
+BASE_UNITS = {'mass': 'g', 'volume': 'ml', 'length': 'mm', 'data': 'mb', 'count': 'ct'}
+
+# (canonical, dimension, factor to base, spellings)
+# Bare "in" is left out on purpose - "6 in 1" is not a length. Bare "oz" is
+# mass: US labels print net weight as "oz" even on sauces, and only write
+# "fl oz" when they mean volume, so "oz" never converts to ml
+UNIT_TABLE = [
+    ('mg', 'mass', 0.001, ('mg', 'milligram', 'milligrams')),
+    ('g', 'mass', 1.0, ('g', 'gram', 'grams')),
+    ('kg', 'mass', 1000.0, ('kg', 'kilogram', 'kilograms')),
+    ('oz', 'mass', 28.349523125, ('oz', 'ounce', 'ounces')),
+    ('lb', 'mass', 453.59237, ('lb', 'lbs', 'pound', 'pounds')),
+    ('floz', 'volume', 29.5735295625, ('fl oz', 'fl. oz', 'floz', 'fluid ounce', 'fluid ounces')),
+    ('ml', 'volume', 1.0, ('ml', 'milliliter', 'milliliters', 'millilitre', 'millilitres')),
+    ('l', 'volume', 1000.0, ('l', 'liter', 'liters', 'litre', 'litres')),
+    ('qt', 'volume', 946.352946, ('qt', 'qts', 'quart', 'quarts')),
+    ('gal', 'volume', 3785.411784, ('gal', 'gallon', 'gallons')),
+    ('mm', 'length', 1.0, ('mm', 'millimeter', 'millimeters')),
+    ('cm', 'length', 10.0, ('cm', 'centimeter', 'centimeters')),
+    ('m', 'length', 1000.0, ('m', 'meter', 'meters', 'metre', 'metres')),
+    ('in', 'length', 25.4, ('inch', 'inches', '"')),
+    ('ft', 'length', 304.8, ('ft', 'foot', 'feet')),
+    ('yd', 'length', 914.4, ('yd', 'yard', 'yards')),
+    ('mb', 'data', 1.0, ('mb',)),
+    ('gb', 'data', 1000.0, ('gb',)),
+    ('tb', 'data', 1000000.0, ('tb',)),
+    ('ct', 'count', 1.0, ('ct', 'count', 'pk', 'pack', 'pc', 'pcs', 'piece', 'pieces')),
+]
+
+# Lookup by spelling with whitespace removed ("fl oz" -> "floz")
+UNITS: Dict[str, Unit] = {}
+_SPELLINGS = set()
+for _canonical, _dimension, _factor, _spellings in UNIT_TABLE:
+    _unit = Unit(_canonical, _dimension, _factor)
+    UNITS[_canonical] = _unit
+    for _spelling in _spellings:
+        UNITS[_spelling.replace(' ', '')] = _unit
+        _SPELLINGS.add(_spelling)
+
+# Longest spelling first so "ml" wins over "m" and "ounces" over "oz"
+_ALTERNATION = '|'.join(
+    re.escape(spelling).replace(r'\ ', r'\s*')
+    for spelling in sorted(_SPELLINGS, key=len, reverse=True)
+)
+
+# Matches lowercased text: number, optional space, unit not followed by a letter
+MEASUREMENT_PATTERN = re.compile(rf'(\d+(?:\.\d+)?)\s*({_ALTERNATION})(?![a-z])')
+_CANONICAL_TOKEN = re.compile(r'^(\d+(?:\.\d+)?)([a-z"]+)$')
+
+# Significant figures kept when a value had to be converted, so 1qt (946.35ml)
+# and 946ml still collide; values already in the base unit are kept exact
+KEY_PRECISION = 3
+
+
+class Measurement(NamedTuple):
+    value: float
+    unit: Unit
+
+    @property
+    def token(self) -> str:
+        """Canonical spelling, e.g. '6qt', '1.5l', '256gb'"""
+        return f"{_format_number(self.value)}{self.unit.canonical}"
+
+    @property
+    def base_value(self) -> float:
+        return self.value * self.unit.to_base
+
+    @property
+    def key(self) -> str:
+        """Unit-independent key, e.g. 32oz and 2lb both give 'mass:907g'"""
+        base = self.base_value
+        if self.unit.to_base != 1.0:
+            base = _round_converted(base)
+        return f"{self.unit.dimension}:{_format_number(base)}{BASE_UNITS[self.unit.dimension]}"
+
+
+def _round_converted(value: float) -> float:
+    """Drop conversion noise: KEY_PRECISION significant figures, but never below whole base units"""
+    if value == 0:
+        return 0.0
+    digits = KEY_PRECISION - 1 - math.floor(math.log10(abs(value)))
+    return round(value, max(digits, 0))
+
+
+def _format_number(value: float) -> str:
+    return f"{value:.6f}".rstrip('0').rstrip('.')
+
+
+def _normalize_spelling(spelling: str) -> str:
+    return re.sub(r'\s+', '', spelling.lower())
+
+
+def parse_measurement(number: str, unit: str) -> Optional[Measurement]:
+    """Build a Measurement from a matched number and unit spelling"""
+    known = UNITS.get(_normalize_spelling(unit))
+    if known is None:
+        return None
+    return Measurement(float(number), known)
+
+
+def from_token(value: str) -> Optional[Measurement]:
+    """Parse a canonical measurement token ('6qt') back into a Measurement"""
+    match = _CANONICAL_TOKEN.match(value.lower())
+    if not match:
+        return None
+    return parse_measurement(match.group(1), match.group(2))
+
+
+def measurement_key(value: str) -> Optional[str]:
+    """Base-unit key for a measurement token, or None if it is not one"""
+    measurement = from_token(value)
+    return measurement.key if measurement else None
+
+
+def find_measurements(lowered_text: str):
+    """Yield (match, Measurement) for every measurement in lowercased text"""
+    for match in MEASUREMENT_PATTERN.finditer(lowered_text):
+        measurement = parse_measurement(match.group(1), match.group(2))
+        if measurement is not None:
+            yield match, measurement
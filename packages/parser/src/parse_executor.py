@@ -0,0 +1,514 @@
+"""
+Parse Executor - Process pool for CPU-bound parsing
+GenericParser is pure Python, so threads serialize on the GIL; this keeps a pool
+of pre-warmed worker processes and only pays IPC when the input is big enough
+"""
+from typing import List, Dict, Any, Optional, Tuple, Union
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict
+import logging
+import multiprocessing
+import os
+import threading
+
+try:
+    from profiling import span
+except ImportError:  # Outside the backend: no request profiling, spans are no-ops
+    from contextlib import nullcontext as span
+
+from parser import GenericParser, ParseResult, Token
+from token_buffer import TokenRing, TokenTableView
+
+logger = logging.getLogger(__name__)
+
+# Worker-process state - built once by the pool initializer
+_worker_parser: Optional[GenericParser] = None
+_worker_ring: Optional[TokenRing] = None
+# Pattern snapshot and counters as of the last report to the web process
+_worker_patterns = None
+_worker_reported: Dict[str, tuple] = {}
+
+# Inputs that exercise every token pattern, used to warm a fresh worker
+WARM_UP_INPUTS = [
+    'iPhone 15 Pro 256GB',
+    '"Atomic Habits" by James Clear',
+    'organic honey 32oz, dewalt 20v drill and Nike Air Max 90 size 10',
+]
+
+
+def _init_worker(ring_name: Optional[str] = None, ring_slots: int = 0, slot_size: int = 0):
+    """Pool initializer: build the parser, warm its caches and attach the token ring"""
+    global _worker_parser, _worker_ring
+    _worker_parser = GenericParser()
+    for text in WARM_UP_INPUTS:
+        _worker_parser.parse(text)
+    # Warm-up parses are not traffic; start reporting from here
+    _pattern_deltas()
+
+    if ring_name:
+        _worker_ring = TokenRing.attach(ring_name, ring_slots, slot_size)
+
+
+def _pattern_deltas() -> Tuple[Any, Dict[str, tuple]]:
+    """
+    Pattern counters gathered since the last report, with their config version
+
+    Each worker has its own registry, so without this the web process's
+    pattern stats would only cover inline parses.
+    """
+    global _worker_patterns, _worker_reported
+    patterns = _worker_parser.registry.current()
+    if patterns is not _worker_patterns:
+        _worker_patterns, _worker_reported = patterns, {}
+    counters = patterns.counters()
+    deltas = {}
+    for name, values in counters.items():
+        previous = _worker_reported.get(name, (0, 0, 0, 0))
+        if values != previous:
+            deltas[name] = tuple(now - before for now, before in zip(values, previous))
+    _worker_reported = counters
+    return patterns.version, deltas
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _parse_chunk(texts: List[str]) -> Tuple[list, tuple]:
+    """Parse a batch of texts in a worker, returning compact results and pattern deltas"""
+    rows = [encode_result(_worker_parser.parse(text)) for text in texts]
+    return rows, _pattern_deltas()
+
+
+def _parse_chunk_shared(texts: List[str], slot: int) -> Tuple[str, list, tuple]:
+    """
+    Parse a batch and write its token tables into a ring slot
+
+    Only small per-text metadata is pickled back. Falls back to compact
+    tuples when the tables do not fit in the slot.
+    """
+    results = [_worker_parser.parse(text) for text in texts]
+    spans = _worker_ring.write(slot, [result.tokens for result in results])
+    if spans is None:
+        return 'tuples', [encode_result(result) for result in results], _pattern_deltas()
+
+    return 'shared', [
+        (start, count, _encode_products(result), result.confidence, result.parser_used)
+        for (start, count), result in zip(spans, results)
+    ], _pattern_deltas()
+
+
+def _encode_products(result: ParseResult) -> List[tuple]:
+    """Products as (search_query, cache_key, raw_text, token indices, priority_tokens)"""
+    token_index = {
+        (t.position, t.type, t.value): i for i, t in enumerate(result.tokens)
+    }
+    return [
+        (
+            product['search_query'],
+            product['cache_key'],
+            product['raw_text'],
+            [token_index[(t['position'], t['type'], t['value'])] for t in product['tokens']],
+            product['priority_tokens']
+        )
+        for product in result.products
+    ]
+
+
+def _decode_products(product_rows: List[tuple], tokens: List[Token]) -> List[Dict[str, Any]]:
+    return [
+        {
+            'search_query': search_query,
+            'cache_key': cache_key,
+            'tokens': [asdict(tokens[i]) for i in indices],
+            'raw_text': product_text,
+            'token_count': len(indices),
+            'priority_tokens': priority_tokens
+        }
+        for search_query, cache_key, product_text, indices, priority_tokens in product_rows
+    ]
+
+
+def encode_result(result: ParseResult) -> tuple:
+    """
+    Flatten a ParseResult into plain tuples for cheap pickling
+
+    Products reference tokens by index instead of carrying their own
+    asdict() copies, so each token crosses the process boundary once.
+    """
+    tokens = [
+        (t.value, t.type, t.confidence, t.position, t.context)
+        for t in result.tokens
+    ]
+    return (
+        tokens, _encode_products(result),
+        result.confidence, result.parser_used, result.raw_text
+    )
+
+
+def decode_result(compact: tuple) -> ParseResult:
+    """Rebuild a ParseResult (identical to an inline parse) from encode_result output"""
+    token_rows, product_rows, confidence, parser_used, raw_text = compact
+    tokens = [Token(*row) for row in token_rows]
+    return ParseResult(
+        products=_decode_products(product_rows, tokens),
+        tokens=tokens,
+        confidence=confidence,
+        parser_used=parser_used,
+        raw_text=raw_text
+    )
+
+
+class ParsedTable:
+    """
+    One parse whose tokens may still live in shared memory
+
+    Only exists while its chunk is collected: materialize() decodes the
+    TokenTableView into Token objects so the slot can go back to the ring.
+    """
+
+    def __init__(
+        self,
+        tokens: Union[TokenTableView, List[Token]],
+        product_rows: List[tuple],
+        confidence: float,
+        parser_used: str,
+        raw_text: str
+    ):
+        self.tokens = tokens
+        self.product_rows = product_rows
+        self.confidence = confidence
+        self.parser_used = parser_used
+        self.raw_text = raw_text
+
+    @property
+    def is_shared(self) -> bool:
+        return isinstance(self.tokens, TokenTableView)
+
+    def materialize(self):
+        """Decode the token table into Token objects and drop the shared view"""
+        if self.is_shared:
+            view = self.tokens
+            self.tokens = view.tokens()
+            view.release()
+
+    def to_result(self) -> ParseResult:
+        self.materialize()
+        return ParseResult(
+            products=_decode_products(self.product_rows, self.tokens),
+            tokens=self.tokens,
+            confidence=self.confidence,
+            parser_used=self.parser_used,
+            raw_text=self.raw_text
+        )
+
+
+class ParseExecutor:
+    """
+    Dispatches parses to a pool of pre-warmed worker processes
+
+    - Tiny inputs are parsed inline; IPC would cost more than the parse
+    - Batches are packed into chunks of roughly chunk_chars so each task
+      is big enough to amortize the round trip
+    - With shared_memory, token tables come back through a TokenRing
+      instead of being pickled
+    - While the pool warms up in the background (or if it failed to start),
+      everything is parsed inline; a pool that breaks later (a worker was
+      killed) is rebuilt the same way while calls fall back to inline
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        inline_threshold: int = 256,
+        chunk_chars: int = 8192,
+        shared_memory: bool = True,
+        ring_slots: Optional[int] = None,
+        slot_size: int = 1 << 20
+    ):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.inline_threshold = inline_threshold
+        self.chunk_chars = chunk_chars
+        self.shared_memory = shared_memory
+        self.ring_slots = ring_slots or self.max_workers * 2
+        self.slot_size = slot_size
+
+        self._inline_parser = GenericParser()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._ring: Optional[TokenRing] = None
+        self._pool_lock = threading.Lock()
+        self._warming: Optional[threading.Thread] = None
+        self._pool_failed = False
+        self._counts_lock = threading.Lock()
+        self._counts = {
+            'inline': 0, 'pooled': 0, 'tasks': 0, 'shared': 0, 'pickled': 0, 'pool_restarts': 0
+        }
+
+    def _count(self, name: str, amount: int = 1):
+        with self._counts_lock:
+            self._counts[name] += amount
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    initargs = ()
+                    if self.shared_memory:
+                        self._ring = TokenRing.create(self.ring_slots, self.slot_size)
+                        initargs = (self._ring.name, self.ring_slots, self.slot_size)
+
+                    # Never fork a threaded web worker; forkserver/spawn start clean
+                    methods = multiprocessing.get_all_start_methods()
+                    context = multiprocessing.get_context(
+                        'forkserver' if 'forkserver' in methods else 'spawn'
+                    )
+                    if 'forkserver' in methods:
+                        # The default preload re-imports the web app's __main__ into
+                        # the fork server; workers only need the parser
+                        context.set_forkserver_preload(['parse_executor'])
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=context,
+                        initializer=_init_worker,
+                        initargs=initargs
+                    )
+        return self._pool
+
+    def _current_pool(self) -> Tuple[ProcessPoolExecutor, Optional[TokenRing]]:
+        """The pool and ring a call should use, captured together"""
+        self._get_pool()
+        with self._pool_lock:
+            pool, ring = self._pool, self._ring
+        if pool is None:
+            # Discarded by a concurrent restart
+            raise BrokenProcessPool("Parse worker pool is restarting")
+        return pool, ring
+
+    def warm_up(self):
+        """Start every worker process now instead of on the first big request"""
+        pool = self._get_pool()
+        futures = [pool.submit(_ping) for _ in range(self.max_workers)]
+        for future in futures:
+            future.result()
+
+    def start_warm_up(self) -> threading.Thread:
+        """
+        Start the workers on a background thread and return it
+
+        Starting a pool takes seconds (fork server, imports, parser warm-up),
+        so requests that arrive meanwhile are parsed inline instead of
+        waiting for it.
+        """
+        thread = threading.Thread(
+            target=self._warm_up_in_background, name='parse-pool-warm-up', daemon=True
+        )
+        self._warming = thread
+        thread.start()
+        return thread
+
+    def _restart_pool(self, broken: ProcessPoolExecutor):
+        """Discard a broken pool and its ring, and warm a new one in the background"""
+        with self._pool_lock:
+            if self._pool is not broken:
+                return  # Another call already restarted it
+            ring = self._ring
+            self._pool, self._ring = None, None
+            thread = threading.Thread(
+                target=self._warm_up_in_background, args=(broken, ring),
+                name='parse-pool-warm-up', daemon=True
+            )
+            # Set before the lock is released so no call builds a pool in the meantime
+            self._warming = thread
+        self._count('pool_restarts')
+        thread.start()
+
+    def _warm_up_in_background(self, broken=None, ring=None):
+        if broken is not None:
+            broken.shutdown(wait=True, cancel_futures=True)
+        if ring is not None:
+            try:
+                ring.close()
+            except BufferError:
+                # A call still holds a view into it; unlink now, unmap on collection
+                ring.shm.unlink()
+        try:
+            self.warm_up()
+        except Exception:
+            logger.exception("Parse worker pool failed to start; parsing inline")
+            self._pool_failed = True
+            try:
+                self.shutdown()
+            except Exception:
+                logger.exception("Parse worker pool shutdown failed")
+
+    def _pool_ready(self) -> bool:
+        warming = self._warming
+        return not self._pool_failed and (warming is None or not warming.is_alive())
+
+    def parse(self, text: str) -> ParseResult:
+        """Parse one input, inline if small, otherwise on a worker"""
+        if not text or len(text) < self.inline_threshold or not self._pool_ready():
+            self._count('inline')
+            return self._inline_parser.parse(text)
+        return self.parse_batch([text])[0]
+
+    def parse_batch(self, texts: List[str]) -> List[ParseResult]:
+        """Parse many inputs, preserving order"""
+        if sum(len(text) for text in texts) < self.inline_threshold or not self._pool_ready():
+            self._count('inline', len(texts))
+            return [self._inline_parser.parse(text) for text in texts]
+
+        pool = None
+        try:
+            # Submit, wait and decode; worker-side parse stages are not in this profile
+            with span('pool_dispatch'):
+                pool, ring = self._current_pool()
+                if not self.shared_memory:
+                    return self._parse_batch_pickled(texts, pool)
+                return [table.to_result() for table in self._run_shared(texts, pool, ring)]
+        except BrokenProcessPool:
+            # A worker died (OOM killer, signal); finish this call inline
+            logger.warning("Parse worker pool is broken; parsing inline while it restarts")
+            if pool is not None:
+                self._restart_pool(pool)
+            self._count('inline', len(texts))
+            return [self._inline_parser.parse(text) for text in texts]
+
+    def _parse_batch_pickled(self, texts: List[str], pool: ProcessPoolExecutor) -> List[ParseResult]:
+        futures = []
+        for start, chunk in self._chunk(texts):
+            futures.append((start, pool.submit(_parse_chunk, chunk)))
+        self._count('tasks', len(futures))
+        self._count('pickled', len(futures))
+
+        results: List[Optional[ParseResult]] = [None] * len(texts)
+        for start, future in futures:
+            rows, deltas = future.result()
+            self._merge_pattern_stats(deltas)
+            for offset, compact in enumerate(rows):
+                results[start + offset] = decode_result(compact)
+        # Only once every chunk came back; a broken pool means these parse inline
+        self._count('pooled', len(texts))
+        return results
+
+    def _merge_pattern_stats(self, deltas: tuple):
+        """Add a worker's pattern counters to ours if it ran the same config version"""
+        version, counters = deltas
+        patterns = self._inline_parser.registry.current()
+        if counters and patterns.version == version:
+            patterns.merge(counters)
+
+    def _run_shared(self, texts: List[str], pool: ProcessPoolExecutor, ring: TokenRing) -> List[ParsedTable]:
+        """
+        Fan chunks out over the ring, collecting results in order
+
+        When the ring is full, the oldest chunk of this call is collected
+        and decoded so its slot frees up - a batch can be larger than the
+        ring without deadlocking on its own slots.
+        """
+        tables: List[Optional[ParsedTable]] = [None] * len(texts)
+        pending = deque()  # (start, slot, future)
+
+        try:
+            for start, chunk in self._chunk(texts):
+                slot = ring.try_acquire()
+                while slot is None:
+                    if not pending:
+                        # Other requests own every slot; wait for one
+                        slot = ring.acquire()
+                        break
+                    self._collect(pending.popleft(), ring, texts, tables)
+                    slot = ring.try_acquire()
+
+                pending.append((start, slot, pool.submit(_parse_chunk_shared, chunk, slot)))
+                self._count('tasks')
+
+            while pending:
+                self._collect(pending.popleft(), ring, texts, tables)
+            self._count('pooled', len(texts))
+        except BaseException:
+            for _, slot, future in pending:
+                # A worker may still be writing into the slot
+                if not future.cancel():
+                    future.exception()
+                ring.release(slot)
+            raise
+
+        return tables
+
+    def _collect(self, entry, ring, texts, tables):
+        start, slot, future = entry
+        try:
+            mode, rows, deltas = future.result()
+        except BaseException:
+            ring.release(slot)
+            raise
+        self._merge_pattern_stats(deltas)
+
+        if mode == 'tuples':
+            self._count('pickled')
+            for offset, compact in enumerate(rows):
+                tokens, products, confidence, parser_used, raw_text = compact
+                tables[start + offset] = ParsedTable(
+                    [Token(*row) for row in tokens], products, confidence, parser_used, raw_text
+                )
+            ring.release(slot)
+            return
+
+        self._count('shared')
+        try:
+            for offset, (token_start, count, products, confidence, parser_used) in enumerate(rows):
+                table = ParsedTable(
+                    ring.view(slot, token_start, count),
+                    products, confidence, parser_used, texts[start + offset]
+                )
+                # Decode now; the slot is reused as soon as it is released
+                table.materialize()
+                tables[start + offset] = table
+        finally:
+            ring.release(slot)
+
+    def _chunk(self, texts: List[str]) -> List[Tuple[int, List[str]]]:
+        """Split texts into (start_index, texts) chunks of about chunk_chars"""
+        # Keep at least one chunk per worker when there is enough work to share
+        target = min(
+            self.chunk_chars,
+            max(self.inline_threshold, sum(len(t) for t in texts) // self.max_workers)
+        )
+
+        chunks = []
+        start = 0
+        current: List[str] = []
+        size = 0
+        for i, text in enumerate(texts):
+            if current and size + len(text) > target:
+                chunks.append((start, current))
+                start, current, size = i, [], 0
+            current.append(text)
+            size += len(text)
+        if current:
+            chunks.append((start, current))
+        return chunks
+
+    def stats(self) -> Dict[str, Any]:
+        with self._counts_lock:
+            counts = dict(self._counts)
+        return {
+            'max_workers': self.max_workers,
+            'pool_started': self._pool is not None,
+            'pool_ready': self._pool is not None and self._pool_ready(),
+            'inline_threshold': self.inline_threshold,
+            'shared_memory': self.shared_memory,
+            'ring_slots': self.ring_slots if self.shared_memory else 0,
+            **counts
+        }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        if self._ring is not None:
+            self._ring.close()
+            self._ring = None
@@ -3,10 +3,24 @@ Generic Product Parser - Extracts meaningful tokens from ANY product text
 No category assumptions - truly universal parsing
 """
 import re
+import time
 from typing import List, Dict, Any, Optional
 from dataclasses import dataclass, asdict
 import json
 
+try:
+    from profiling import span
+except ImportError:  # Outside the backend: no request profiling, spans are no-ops
+    from contextlib import nullcontext as span
+
+from dictionary_matcher import DictionaryMatcher, load_default_matcher
+from measurements import measurement_key
+from pattern_registry import PatternRegistry, load_default_registry
+
+
+# Profiling span per pattern kind; plain regex classes share one
+PATTERN_SPANS = {'dictionary': 'dictionary_match', 'measurement': 'measurements'}
+
 
 @dataclass
 class Token:
@@ -34,15 +48,21 @@ class GenericParser:
     Works for ANY product - from electronics to groceries to unicorn onesies.
     """
     
-    def __init__(self):
-        # Common words to filter out
-        self.stop_words = {
-            'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 
-            'to', 'for', 'of', 'with', 'by', 'from', 'up', 'about',
-            'into', 'through', 'during', 'before', 'after', 'above',
-            'below', 'between', 'under', 'i', 'want', 'need', 'buy',
-            'get', 'find', 'search', 'looking'
-        }
+    def __init__(
+        self,
+        dictionary: Optional[DictionaryMatcher] = None,
+        registry: Optional[PatternRegistry] = None
+    ):
+        # Known brands/product lines, matched regardless of capitalization
+        self.dictionary = dictionary if dictionary is not None else load_default_matcher()
+        
+        # Token classes and stop words come from the versioned pattern config
+        self.registry = registry if registry is not None else load_default_registry()
+    
+    @property
+    def stop_words(self):
+        """Common words to filter out (from the active pattern config)"""
+        return self.registry.current().stop_words
         
     def parse(self, text: str) -> ParseResult:
         """
@@ -62,10 +82,12 @@ class GenericParser:
         text = self._normalize_text(text)
         
         # Extract all meaningful tokens
-        tokens = self._extract_tokens(text)
+        with span('tokenize'):
+            tokens = self._extract_tokens(text)
         
-        # Build search queries from tokens
-        products = self._build_products(tokens, original_text)
+        # Build search queries from tokens (and unit-independent cache keys)
+        with span('build_products'):
+            products = self._build_products(tokens, original_text)
         
         # Calculate overall confidence
         confidence = self._calculate_confidence(tokens)
@@ -88,76 +110,41 @@ class GenericParser:
     
     def _extract_tokens(self, text: str) -> List[Token]:
         """Extract all meaningful tokens without category assumptions"""
+        # One snapshot per parse, so a hot swap never mixes pattern versions
+        patterns = self.registry.current()
+        lowered = text.lower()
         tokens = []
-        position = 0
         used_positions = set()
         
-        # 1. Extract quoted phrases first (highest priority)
-        quoted_pattern = r'"([^"]+)"'
-        for match in re.finditer(quoted_pattern, text):
-            tokens.append(Token(
-                value=match.group(1),
-                type='exact_phrase',
-                confidence=1.0,
-                position=match.start()
-            ))
-            used_positions.update(range(match.start(), match.end()))
-        
-        # 2. Extract measurements (universal for any product)
-        measurement_pattern = r'(\d+(?:\.\d+)?)\s*(gb|tb|mb|kg|g|mg|lbs?|oz|ml|l|inch|"|cm|mm|pk|pack|count|ct|pc|quart|qt|gallon|gal|yard|yd|meter|m|foot|ft)'
-        for match in re.finditer(measurement_pattern, text.lower()):
-            if match.start() not in used_positions:
-                value = f"{match.group(1)}{match.group(2)}"
-                tokens.append(Token(
-                    value=value,
-                    type='measurement',
-                    confidence=0.95,
-                    position=match.start()
-                ))
-                used_positions.update(range(match.start(), match.end()))
-        
-        # 3. Extract model numbers (mix of letters and numbers)
-        model_pattern = r'\b([A-Z]+[\d]+[A-Z\d]*|[\d]+[A-Z]+[\d\w]*)\b'
-        for match in re.finditer(model_pattern, text):
-            if match.start() not in used_positions:
-                tokens.append(Token(
-                    value=match.group(1),
-                    type='model',
-                    confidence=0.85,
-                    position=match.start()
-                ))
-                used_positions.update(range(match.start(), match.end()))
-        
-        # 4. Extract standalone numbers
-        number_pattern = r'\b(\d+)\b'
-        for match in re.finditer(number_pattern, text):
-            if match.start() not in used_positions:
-                tokens.append(Token(
-                    value=match.group(1),
-                    type='number',
-                    confidence=0.7,
-                    position=match.start()
-                ))
-                used_positions.update(range(match.start(), match.end()))
-        
-        # 5. Extract brand-like words (capitalized)
-        brand_pattern = r'\b([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\b'
-        for match in re.finditer(brand_pattern, text):
-            if match.start() not in used_positions:
-                tokens.append(Token(
-                    value=match.group(1),
-                    type='brand',
-                    confidence=0.8,
-                    position=match.start()
-                ))
-                used_positions.update(range(match.start(), match.end()))
+        # 1. Run the configured token classes in priority order
+        #    (quoted phrases, measurements, models, numbers, brands...)
+        for pattern in patterns.patterns:
+            started = time.thread_time_ns()
+            hits = 0
+            with span(PATTERN_SPANS.get(pattern.kind, 'patterns')):
+                for start, end, value, context in pattern.matches(text, lowered, self.dictionary):
+                    if pattern.needs_free_span:
+                        if used_positions.intersection(range(start, end)):
+                            continue
+                    elif start in used_positions:
+                        continue
+                    tokens.append(Token(
+                        value=value,
+                        type=pattern.type,
+                        confidence=pattern.confidence,
+                        position=start,
+                        context=context
+                    ))
+                    used_positions.update(range(start, end))
+                    hits += 1
+            pattern.record(hits, time.thread_time_ns() - started)
         
-        # 6. Extract remaining keywords
+        # 2. Extract remaining keywords
         words = text.split()
         word_position = 0
         for word in words:
             word_position = text.find(word, word_position)
-            if word_position not in used_positions and word.lower() not in self.stop_words:
+            if word_position not in used_positions and word.lower() not in patterns.stop_words:
                 # Check if this word wasn't already captured
                 if not any(word in token.value for token in tokens):
                     tokens.append(Token(
@@ -186,7 +173,8 @@ class GenericParser:
             # Multiple products detected
             products = []
             for part in parts:
-                part_tokens = [t for t in tokens if t.value in part]
+                # Measurements carry their original spelling in context
+                part_tokens = [t for t in tokens if (t.context or t.value) in part]
                 if part_tokens:
                     products.append(self._tokens_to_product(part_tokens, part))
             return products
@@ -223,14 +211,37 @@ class GenericParser:
                 seen.add(part.lower())
                 unique_parts.append(part)
         
+        query_tokens = high_priority + medium_priority + low_priority[:3]
+        
         return {
             'search_query': ' '.join(unique_parts),
+            'cache_key': self._cache_key(query_tokens),
             'tokens': [asdict(t) for t in tokens],
             'raw_text': raw_text.strip(),
             'token_count': len(tokens),
             'priority_tokens': [t.value for t in high_priority]
         }
     
+    def _cache_key(self, tokens: List[Token]) -> str:
+        """
+        Order- and unit-independent key for a product's search tokens
+        
+        "instant pot 6 quart" and "6qt Instant Pot" share a key, as do
+        "honey 32oz" and "honey 2 lbs" (measurements compare in base units).
+        """
+        words = set()
+        sizes = set()
+        for token in tokens:
+            if token.type == 'measurement':
+                sizes.add(measurement_key(token.value) or token.value.lower())
+            else:
+                words.update(token.value.lower().split())
+        
+        key = ' '.join(sorted(words))
+        if sizes:
+            key += '|' + ' '.join(sorted(sizes))
+        return key
+    
     def _calculate_confidence(self, tokens: List[Token]) -> float:
         """Calculate overall parsing confidence"""
         if not tokens:
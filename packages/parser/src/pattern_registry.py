@@ -0,0 +1,327 @@
+"""
+Pattern Registry - Token classes and stop words loaded from a versioned config file
+Patterns are compiled once per config version and swapped in atomically, so a
+new pattern from Parser Studio ships without a deploy; each pattern records its
+hit count and CPU time so slow or dead ones can be pulled from the hot path
+"""
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from contextlib import contextmanager
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: publishes are only serialized within a process
+    fcntl = None
+
+from measurements import find_measurements
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATTERNS = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '../data/patterns.json')
+)
+
+# How a token class finds its matches
+KINDS = ('regex', 'measurement', 'dictionary')
+
+# (start, end, value, context)
+Match = Tuple[int, int, str, Optional[str]]
+
+# (evaluations, matched, hits, cpu_ns) - matched counts evaluations with any hit
+Counters = Tuple[int, int, int, int]
+
+# Inputs every candidate config must parse before it is swapped in
+TRIAL_INPUTS = [
+    'iPhone 15 Pro 256GB',
+    '"Atomic Habits" by James Clear',
+    'organic honey 32oz, dewalt 20v drill and Nike Air Max 90 size 10',
+    'instant pot 6 quart\nRed Dress size 8 and 2 lbs coffee',
+]
+
+
+class PatternConfigError(ValueError):
+    """Pattern config is malformed; the active patterns are left untouched"""
+
+
+class CompiledPattern:
+    """One token class, compiled and ready to run"""
+
+    def __init__(self, definition: Dict[str, Any]):
+        self.name = definition['name']
+        self.type = definition['type']
+        self.kind = definition.get('kind', 'regex')
+        self.confidence = float(definition['confidence'])
+        self.group = int(definition.get('group', 1))
+        self.regex = None
+
+        if self.kind == 'regex':
+            flags = re.IGNORECASE if definition.get('ignore_case') else 0
+            self.regex = re.compile(definition['pattern'], flags)
+
+        # Dictionary spans can start mid-way through other tokens' text, so
+        # they need their whole span free; everything else checks the start
+        self.needs_free_span = self.kind == 'dictionary'
+
+        # Counters are updated without a lock - they are statistics, not state
+        self.evaluations = 0
+        self.matched = 0
+        self.hits = 0
+        self.cpu_ns = 0
+
+    def matches(self, text: str, lowered: str, dictionary) -> Iterator[Match]:
+        if self.kind == 'regex':
+            for match in self.regex.finditer(text):
+                value = match.group(self.group)
+                # An optional group that did not take part, or an empty match
+                if value:
+                    yield match.start(), match.end(), value, None
+        elif self.kind == 'measurement':
+            for match, measurement in find_measurements(lowered):
+                yield match.start(), match.end(), measurement.token, text[match.start():match.end()]
+        elif self.kind == 'dictionary':
+            for match in dictionary.find_longest(text):
+                yield match.start, match.end, text[match.start:match.end], None
+
+    def record(self, hits: int, cpu_ns: int):
+        self.evaluations += 1
+        if hits:
+            self.matched += 1
+        self.hits += hits
+        self.cpu_ns += cpu_ns
+
+    def counters(self) -> Counters:
+        return self.evaluations, self.matched, self.hits, self.cpu_ns
+
+    def add(self, evaluations: int, matched: int, hits: int, cpu_ns: int):
+        self.evaluations += evaluations
+        self.matched += matched
+        self.hits += hits
+        self.cpu_ns += cpu_ns
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'type': self.type,
+            'kind': self.kind,
+            'evaluations': self.evaluations,
+            'hits': self.hits,
+            # Share of parses where the pattern matched at least once (0-1)
+            'hit_rate': self.matched / self.evaluations if self.evaluations else 0,
+            'hits_per_parse': self.hits / self.evaluations if self.evaluations else 0,
+            'cpu_ms': self.cpu_ns / 1e6,
+            'avg_cpu_us': self.cpu_ns / self.evaluations / 1000 if self.evaluations else 0
+        }
+
+
+class CompiledPatterns:
+    """Immutable snapshot of one config version"""
+
+    def __init__(self, config: Dict[str, Any], source: Optional[str] = None):
+        self.version = config['version']
+        self.source = source
+        self.loaded_at = time.time()
+        self.config = config
+        self.stop_words = frozenset(word.lower() for word in config['stop_words'])
+        self.patterns: List[CompiledPattern] = [
+            CompiledPattern(definition) for definition in config['patterns']
+        ]
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [pattern.stats() for pattern in self.patterns]
+
+    def counters(self) -> Dict[str, Counters]:
+        return {pattern.name: pattern.counters() for pattern in self.patterns}
+
+    def merge(self, counters: Dict[str, Counters]):
+        """Fold in counters reported by another process (a pool worker) for this version"""
+        by_name = {pattern.name: pattern for pattern in self.patterns}
+        for name, values in counters.items():
+            pattern = by_name.get(name)
+            if pattern is not None:
+                pattern.add(*values)
+
+
+def validate_config(config: Any) -> Dict[str, Any]:
+    """Check a config dict and compile it, raising PatternConfigError on any problem"""
+    if not isinstance(config, dict):
+        raise PatternConfigError("Pattern config must be a JSON object")
+    if not isinstance(config.get('version'), int):
+        raise PatternConfigError('"version" must be an integer')
+    stop_words = config.get('stop_words')
+    if not isinstance(stop_words, list) or not all(isinstance(word, str) for word in stop_words):
+        raise PatternConfigError('"stop_words" must be a list of strings')
+    if not isinstance(config.get('patterns'), list):
+        raise PatternConfigError('"patterns" must be a list')
+
+    seen = set()
+    for definition in config['patterns']:
+        if not isinstance(definition, dict):
+            raise PatternConfigError("Each pattern must be a JSON object")
+        name = definition.get('name')
+        if not isinstance(name, str) or not name or name in seen:
+            raise PatternConfigError(f"Pattern names must be unique, non-empty strings: {name!r}")
+        seen.add(name)
+
+        if definition.get('kind', 'regex') not in KINDS:
+            raise PatternConfigError(f"{name}: kind must be one of {', '.join(KINDS)}")
+        if not isinstance(definition.get('type'), str) or not definition['type']:
+            raise PatternConfigError(f"{name}: token type must be a non-empty string")
+        confidence = definition.get('confidence')
+        if not isinstance(confidence, (int, float)) or not 0 <= confidence <= 1:
+            raise PatternConfigError(f"{name}: confidence must be between 0 and 1")
+        group = definition.get('group', 1)
+        if isinstance(group, bool) or not isinstance(group, int) or group < 0:
+            raise PatternConfigError(f"{name}: group must be a non-negative integer")
+        if definition.get('kind', 'regex') == 'regex':
+            if not isinstance(definition.get('pattern'), str):
+                raise PatternConfigError(f"{name}: regex pattern must be a string")
+            try:
+                compiled = re.compile(definition['pattern'])
+            except re.error as e:
+                raise PatternConfigError(f"{name}: invalid regex ({e})")
+            if compiled.groups < group:
+                raise PatternConfigError(f"{name}: regex has no group {group}")
+    return config
+
+
+class _FixedRegistry:
+    """Registry stand-in that always serves one snapshot"""
+
+    def __init__(self, patterns: CompiledPatterns):
+        self.patterns = patterns
+
+    def current(self) -> CompiledPatterns:
+        return self.patterns
+
+
+def compile_config(config: Any, source: Optional[str] = None) -> CompiledPatterns:
+    """
+    Validate and compile a config, then trial-parse TRIAL_INPUTS with it
+
+    Validation cannot see every runtime failure (a regex can match in ways
+    the parser does not expect), so a config that breaks a parse is
+    rejected here rather than after it has replaced a working one.
+    """
+    from parser import GenericParser
+
+    validate_config(config)
+    try:
+        trial = GenericParser(registry=_FixedRegistry(CompiledPatterns(config)))
+        for text in TRIAL_INPUTS:
+            trial.parse(text)
+    except Exception as e:
+        raise PatternConfigError(f"Config fails on sample inputs: {type(e).__name__}: {e}")
+    # Fresh snapshot, so trial parses do not show up in the stats
+    return CompiledPatterns(config, source=source)
+
+
+class PatternRegistry:
+    """
+    Holds the active CompiledPatterns and swaps in new versions
+
+    Readers take one snapshot per parse via current(), so a swap never mixes
+    versions within a request. The file is re-checked at most every
+    check_interval seconds, which is also how process-pool workers pick up
+    a change made in the web process.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATTERNS, check_interval: float = 5.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mtime = os.path.getmtime(path)
+        self._checked_at = time.monotonic()
+        self._active = CompiledPatterns(self._read(), source=path)
+
+    def _read(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                config = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            raise PatternConfigError(f"Cannot read {self.path}: {e}")
+        return validate_config(config)
+
+    def current(self) -> CompiledPatterns:
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval:
+            self._checked_at = now
+            try:
+                if os.path.getmtime(self.path) != self._mtime:
+                    self.reload()
+            except (OSError, PatternConfigError):
+                logger.exception("Pattern reload failed; keeping version %s", self._active.version)
+        return self._active
+
+    def reload(self) -> CompiledPatterns:
+        """Re-read the config file and swap it in"""
+        with self._lock:
+            mtime = os.path.getmtime(self.path)
+            compiled = compile_config(self._read(), source=self.path)
+            self._active = compiled
+            self._mtime = mtime
+        logger.info("Loaded pattern config version %s", compiled.version)
+        return compiled
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock shared by every process that publishes to this file"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(f"{self.path}.lock", 'w') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def publish(self, config: Dict[str, Any]) -> CompiledPatterns:
+        """
+        Validate a new config, write it to the versioned file and swap it in
+
+        The version must move forward, so two editors cannot silently
+        overwrite each other. It is checked against the file under a lock,
+        not this process's copy, since another worker may have published.
+        """
+        compiled = compile_config(config, source=self.path)
+        with self._file_lock():
+            try:
+                current = self._read()['version']
+            except PatternConfigError:
+                current = self._active.version
+            current = max(current, self._active.version)
+            if config['version'] <= current:
+                raise PatternConfigError(
+                    f"Version {config['version']} is not newer than {current}"
+                )
+
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(config, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+            self._active = compiled
+            self._mtime = os.path.getmtime(self.path)
+        return compiled
+
+
+_default_registry: Optional[PatternRegistry] = None
+_default_lock = threading.Lock()
+
+
+def load_default_registry() -> PatternRegistry:
+    """Shared registry for the config at PARSER_PATTERNS (or the bundled default)"""
+    global _default_registry
+    if _default_registry is None:
+        with _default_lock:
+            if _default_registry is None:
+                _default_registry = PatternRegistry(
+                    os.environ.get('PARSER_PATTERNS', DEFAULT_PATTERNS)
+                )
+    return _default_registry
@@ -0,0 +1,237 @@
+"""
+Token Buffer - Shared-memory ring for moving token tables out of parse workers
+Workers write columnar token tables (type codes, positions, confidences, string
+offsets) into a slot; the web process decodes them straight from the slot, so
+token data is never pickled on the way back
+"""
+from typing import List, Optional, Tuple
+from multiprocessing import shared_memory
+import queue
+import struct
+
+from parser import Token
+
+
+# Type codes stored in the table - order is part of the buffer format
+TOKEN_TYPES = ('exact_phrase', 'measurement', 'model', 'number', 'brand', 'keyword')
+TYPE_CODES = {name: code for code, name in enumerate(TOKEN_TYPES)}
+
+# Marks a None context in the length column
+NO_CONTEXT = 0xFFFFFFFF
+
+# Columns take 25 bytes per token, in native byte order so readers can
+# memoryview.cast() them; the rest of this per-token budget is string arena
+_BYTES_PER_TOKEN = 64
+
+
+def _align(offset: int) -> int:
+    return (offset + 3) & ~3
+
+
+class SlotLayout:
+    """Byte offsets of each column inside one ring slot"""
+
+    def __init__(self, slot_size: int):
+        self.slot_size = slot_size
+        self.capacity = slot_size // _BYTES_PER_TOKEN
+
+        offset = 0
+        self.types = offset
+        offset = _align(offset + self.capacity)
+        self.positions = offset
+        offset += self.capacity * 4
+        self.confidences = offset
+        offset += self.capacity * 4
+        self.value_offsets = offset
+        offset += self.capacity * 4
+        self.value_lengths = offset
+        offset += self.capacity * 4
+        self.context_offsets = offset
+        offset += self.capacity * 4
+        self.context_lengths = offset
+        offset += self.capacity * 4
+        self.arena = offset
+        self.arena_size = slot_size - offset
+
+
+class TokenRing:
+    """
+    Fixed ring of shared-memory slots
+
+    The owning (web) process hands out slot indices and gets them back, so
+    workers never contend on a slot and no cross-process lock is needed.
+    When every slot is busy, acquire() blocks - natural backpressure.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, slots: int, slot_size: int, owner: bool):
+        self.shm = shm
+        self.slots = slots
+        self.slot_size = slot_size
+        self.layout = SlotLayout(slot_size)
+        self.owner = owner
+        self._free: Optional[queue.Queue] = None
+        if owner:
+            self._free = queue.Queue()
+            for slot in range(slots):
+                self._free.put(slot)
+
+    @classmethod
+    def create(cls, slots: int, slot_size: int) -> 'TokenRing':
+        shm = shared_memory.SharedMemory(create=True, size=slots * slot_size)
+        return cls(shm, slots, slot_size, owner=True)
+
+    @classmethod
+    def attach(cls, name: str, slots: int, slot_size: int) -> 'TokenRing':
+        # Pool workers share the owner's resource tracker, so attaching does
+        # not add a second registration; only the owner unlinks the segment
+        shm = shared_memory.SharedMemory(name=name)
+        return cls(shm, slots, slot_size, owner=False)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def acquire(self) -> int:
+        return self._free.get()
+
+    def try_acquire(self) -> Optional[int]:
+        try:
+            return self._free.get_nowait()
+        except queue.Empty:
+            return None
+
+    def release(self, slot: int):
+        self._free.put(slot)
+
+    def slot_view(self, slot: int) -> memoryview:
+        start = slot * self.slot_size
+        return self.shm.buf[start:start + self.slot_size]
+
+    def write(self, slot: int, token_lists: List[List[Token]]) -> Optional[List[Tuple[int, int]]]:
+        """
+        Write several token lists into one slot (worker side)
+
+        Returns (start, count) per list, or None if the slot is too small or a
+        token type has no code - the caller then falls back to pickling.
+        """
+        layout = self.layout
+        total = sum(len(tokens) for tokens in token_lists)
+        if total > layout.capacity:
+            return None
+
+        buf = self.slot_view(slot)
+        try:
+            arena_pos = 0
+            index = 0
+            spans = []
+            for tokens in token_lists:
+                spans.append((index, len(tokens)))
+                for token in tokens:
+                    code = TYPE_CODES.get(token.type)
+                    if code is None:
+                        return None
+
+                    value = token.value.encode('utf-8')
+                    context = token.context.encode('utf-8') if token.context is not None else b''
+                    if arena_pos + len(value) + len(context) > layout.arena_size:
+                        return None
+
+                    buf[layout.types + index] = code
+                    struct.pack_into('I', buf, layout.positions + index * 4, token.position)
+                    struct.pack_into('f', buf, layout.confidences + index * 4, token.confidence)
+
+                    start = layout.arena + arena_pos
+                    buf[start:start + len(value)] = value
+                    struct.pack_into('I', buf, layout.value_offsets + index * 4, arena_pos)
+                    struct.pack_into('I', buf, layout.value_lengths + index * 4, len(value))
+                    arena_pos += len(value)
+
+                    if token.context is None:
+                        struct.pack_into('I', buf, layout.context_lengths + index * 4, NO_CONTEXT)
+                    else:
+                        start = layout.arena + arena_pos
+                        buf[start:start + len(context)] = context
+                        struct.pack_into('I', buf, layout.context_offsets + index * 4, arena_pos)
+                        struct.pack_into('I', buf, layout.context_lengths + index * 4, len(context))
+                        arena_pos += len(context)
+                    index += 1
+            return spans
+        finally:
+            buf.release()
+
+    def view(self, slot: int, start: int, count: int) -> 'TokenTableView':
+        return TokenTableView(self, slot, start, count)
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class TokenTableView:
+    """
+    Read-only, zero-copy view of one token table inside a ring slot
+
+    Numeric columns are memoryviews straight over shared memory. Strings stay
+    as UTF-8 bytes in the arena until value()/tokens() asks for them. The
+    view is only valid until its slot is released back to the ring.
+    """
+
+    def __init__(self, ring: TokenRing, slot: int, start: int, count: int):
+        layout = ring.layout
+        self._buf = ring.slot_view(slot)
+        self._arena = self._buf[layout.arena:]
+        self.count = count
+
+        def column(offset: int, width: int, fmt: str) -> memoryview:
+            begin = offset + start * width
+            return self._buf[begin:begin + count * width].cast(fmt)
+
+        self.type_codes = column(layout.types, 1, 'B')
+        self.positions = column(layout.positions, 4, 'I')
+        self.confidences = column(layout.confidences, 4, 'f')
+        self._value_offsets = column(layout.value_offsets, 4, 'I')
+        self._value_lengths = column(layout.value_lengths, 4, 'I')
+        self._context_offsets = column(layout.context_offsets, 4, 'I')
+        self._context_lengths = column(layout.context_lengths, 4, 'I')
+
+    def __len__(self) -> int:
+        return self.count
+
+    def type(self, i: int) -> str:
+        return TOKEN_TYPES[self.type_codes[i]]
+
+    def value(self, i: int) -> str:
+        offset = self._value_offsets[i]
+        return str(self._arena[offset:offset + self._value_lengths[i]], 'utf-8')
+
+    def context(self, i: int) -> Optional[str]:
+        length = self._context_lengths[i]
+        if length == NO_CONTEXT:
+            return None
+        offset = self._context_offsets[i]
+        return str(self._arena[offset:offset + length], 'utf-8')
+
+    def token(self, i: int) -> Token:
+        return Token(
+            value=self.value(i),
+            type=self.type(i),
+            # Stored as float32; round back so JSON output matches inline parses
+            confidence=round(self.confidences[i], 6),
+            position=self.positions[i],
+            context=self.context(i)
+        )
+
+    def tokens(self) -> List[Token]:
+        """Decode every row - call this when building the response, not before"""
+        return [self.token(i) for i in range(self.count)]
+
+    def release(self):
+        """Drop all memoryviews so the slot (and segment) can be reused or closed"""
+        for view in (
+            self.type_codes, self.positions, self.confidences,
+            self._value_offsets, self._value_lengths,
+            self._context_offsets, self._context_lengths,
+            self._arena, self._buf
+        ):
+            view.release()
@@ -10,6 +10,10 @@ cd apps/backend
 pip3 install flask flask-cors --quiet 2>/dev/null || pip install flask flask-cors --quiet 2>/dev/null
 cd ../..
 
+# Compile the brand dictionary so workers map it instead of compiling per process
+echo "📦 Compiling brand dictionary..."
+(cd packages/parser && npm run build:dictionary --silent)
+
 # Install web app dependencies
 echo "📦 Installing React dependencies..."
 cd apps/web